@@ -1,6 +1,8 @@
-import tkinter as tk
-from tkinter import messagebox
-import random, math, time, copy
+import random, math, time, os, sys, multiprocessing, collections, pickle
+from schedules import LinearSchedule, ReactiveSchedule, ElitePool, RESTART, STOP
+from pareto import ParetoArchive
+from bitboard import (BitGeometry, popcount, random_bit, bit_indices, compile_neighbors,
+                      regrow_bits, set_board_size as resize_module)
 
 # Grid dimensions
 WIDTH = 21
@@ -13,59 +15,15 @@ MAX_OASIS = 50
 #   True means the cell is active (available), False means inactive.
 active_mask = [[True for _ in range(WIDTH)] for _ in range(HEIGHT)]
 
-# UI for Selecting Active Cells and Oasis Value
-class CellSelector(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title("Select Active Cells")
-        self.buttons = {}
-        for i in range(HEIGHT):
-            for j in range(WIDTH):
-                btn = tk.Button(self, width=2, height=1,
-                                command=lambda i=i, j=j: self.toggle_cell(i, j))
-                btn.grid(row=i, column=j, padx=1, pady=1)
-                self.buttons[(i, j)] = btn
-                btn.config(bg="white")
-                
-        # Add a label and entry for maximum oasis
-        self.max_oasis_label = tk.Label(self, text="Max Oasis:", justify="right")
-        self.max_oasis_label.grid(row=HEIGHT, column=0, columnspan=3, sticky="ne", padx=5, pady=5)
-        
-        self.max_oasis_entry = tk.Entry(self, width=2)
-        self.max_oasis_entry.grid(row=HEIGHT, column=3, columnspan=1, sticky="nw", padx=5, pady=5)
-        self.max_oasis_entry.insert(0, "50")  # default value
-        
-        self.start_button = tk.Button(self, text="Start Optimization", command=self.on_start)
-        self.start_button.grid(row=HEIGHT+1, column=0, columnspan=WIDTH, sticky="we", padx=5, pady=5)
-        self.selected = False
-
-    def toggle_cell(self, i, j):
-        global active_mask
-        active_mask[i][j] = not active_mask[i][j]
-        btn = self.buttons[(i, j)]
-        btn.config(bg="white" if active_mask[i][j] else "gray")
-
-    def on_start(self):
-        global MAX_OASIS
-        try:
-            MAX_OASIS = int(self.max_oasis_entry.get())
-            if MAX_OASIS < 0:
-                raise ValueError()
-            if MAX_OASIS > 50:
-                MAX_OASIS = 50
-        except ValueError:
-            messagebox.showerror("Error", "Invalid maximum oasis value!")
-            return
-        
-        if not any(active_mask[i][j] for i in range(HEIGHT) for j in range(WIDTH)):
-            messagebox.showerror("Error", "No active cells selected!")
-            return
-        self.selected = True
-        self.destroy()
+# Shift masks for the bitboard backend.
+BITS = BitGeometry(WIDTH, HEIGHT)
 
-def run_selection():
-    app = CellSelector()
-    app.mainloop()
+def set_board_size(width, height):
+    """
+    Make the board width x height (see bitboard.set_board_size). solve()
+    calls this with the size of its mask.
+    """
+    resize_module(sys.modules[__name__], width, height)
 
 # Grid Utility Functions
 def in_bounds(i, j):
@@ -77,6 +35,37 @@ def neighbors(i, j):
         if in_bounds(ni, nj):
             yield ni, nj
 
+class Board:
+    """
+    The active mask compiled once (after CellSelector closes) into flat
+    lookup tables. Cell (i, j) is index i * WIDTH + j.
+      - active[k] / active_bits: the mask as a flat list and as a bitboard.
+      - nbrs[k]: indices of the active neighbors of k, in neighbors() order.
+      - table[k]: the same neighbors as (n, neighbor_bits) pairs for regrow_bits.
+      - zobrist[kind][k]: random 64-bit keys per flag (SNAKE, DESSERT, SUBURB)
+        and cell, XORed together into State.hash. They come from a private
+        RNG so building a Board never disturbs the annealer's random stream.
+      - starts: the cells choose_start picks from, where start_move may slide
+        the start of the snake.
+    """
+    __slots__ = ("active", "active_bits", "nbrs", "table", "zobrist", "starts")
+
+    def __init__(self, mask=None):
+        if mask is None:
+            mask = active_mask
+        self.active = [mask[k // WIDTH][k % WIDTH] for k in range(WIDTH * HEIGHT)]
+        self.active_bits = BITS.from_grid(mask)
+        self.table = compile_neighbors(BITS, self.active_bits)
+        self.nbrs = [tuple(n for n, _ in entry) for entry in self.table]
+        rng = random.Random(WIDTH * HEIGHT)
+        self.zobrist = [[rng.getrandbits(64) for _ in range(WIDTH * HEIGHT)] for _ in range(3)]
+        self.starts = frozenset(i * WIDTH + j for i, j in start_cells(mask))
+
+    def __reduce__(self):
+        # Everything is compiled from the mask, so that is all a checkpoint stores.
+        mask = [[self.active[i * WIDTH + j] for j in range(WIDTH)] for i in range(HEIGHT)]
+        return Board, (mask,)
+
 # State Representation
 # We now use a tuple: (snake, dessert_mask, suburb_mask)
 def init_dessert_mask():
@@ -91,37 +80,46 @@ def choose_start():
     Preference: far left or far right side (avoiding corners).
     If none available, choose any active border cell.
     """
+    candidates = start_cells()
+    if candidates:
+        return random.choice(candidates)
+    return None  # Should not happen if at least one active cell exists
+
+def start_cells(mask=None):
+    """The active border cells choose_start picks from, in order of preference."""
+    if mask is None:
+        mask = active_mask
     candidates = []
     # Left border (j=0), avoid top and bottom corners.
     for i in range(1, HEIGHT-1):
-        if active_mask[i][0]:
+        if mask[i][0]:
             candidates.append((i, 0))
     # Right border (j=WIDTH-1)
     for i in range(1, HEIGHT-1):
-        if active_mask[i][WIDTH-1]:
+        if mask[i][WIDTH-1]:
             candidates.append((i, WIDTH-1))
     if candidates:
-        return random.choice(candidates)
+        return candidates
     # Otherwise, try top and bottom borders.
     for j in range(1, WIDTH-1):
-        if active_mask[0][j]:
+        if mask[0][j]:
             candidates.append((0, j))
-        if active_mask[HEIGHT-1][j]:
+        if mask[HEIGHT-1][j]:
             candidates.append((HEIGHT-1, j))
     if candidates:
-        return random.choice(candidates)
+        return candidates
     # Fallback: any active border cell.
     for i in range(HEIGHT):
-        if active_mask[i][0]:
-            return (i, 0)
-        if active_mask[i][WIDTH-1]:
-            return (i, WIDTH-1)
+        if mask[i][0]:
+            return [(i, 0)]
+        if mask[i][WIDTH-1]:
+            return [(i, WIDTH-1)]
     for j in range(WIDTH):
-        if active_mask[0][j]:
-            return (0, j)
-        if active_mask[HEIGHT-1][j]:
-            return (HEIGHT-1, j)
-    return None  # Should not happen if at least one active cell exists
+        if mask[0][j]:
+            return [(0, j)]
+        if mask[HEIGHT-1][j]:
+            return [(HEIGHT-1, j)]
+    return []
 
 def state_to_layout(state):
     """
@@ -167,284 +165,1678 @@ def state_to_layout(state):
                     layout[i][j] = 'M'
     return layout
 
-# Scoring Functions
-def total_score_layout(layout):
+# Scoring Rules
+# Tile codes; TILE_CHARS maps them back to layout letters.
+TILE_I, TILE_T, TILE_M, TILE_R, TILE_O, TILE_D, TILE_S = range(7)
+TILE_CHARS = "ITMRODS"
+TILE_CODES = {c: t for t, c in enumerate(TILE_CHARS)}
+
+# Every scoring tile adds rule(rivers, suburbs) to one channel, where rivers
+# and suburbs count its River and Suburb neighbors. The channels are combined
+# (and capped) only once, by channel_score and channel_stats:
+#   - Thicket: 2 * 2^(# adjacent River cells).
+#   - Maquis: the same amount, half of which is lost from the score.
+#   - Oasis: 30 points each, capped at MAX_OASIS cells.
+#   - Dessert: counted for everything's health.
+#   - Suburb: 1 (or 2 if surrounded on all 4 sides by suburbs) times
+#     2^(# adjacent River cells); the sum is capped at 25 and scaled 10x.
+THICKET_CHANNEL, MAQUIS_CHANNEL, OASIS_CHANNEL, DESSERT_CHANNEL, SUBURB_CHANNEL = range(5)
+SCORING_RULES = {
+    TILE_T: (THICKET_CHANNEL, lambda rivers, suburbs: 2 << rivers),
+    TILE_M: (MAQUIS_CHANNEL, lambda rivers, suburbs: 2 << rivers),
+    TILE_O: (OASIS_CHANNEL, lambda rivers, suburbs: 1),
+    TILE_D: (DESSERT_CHANNEL, lambda rivers, suburbs: 1),
+    TILE_S: (SUBURB_CHANNEL, lambda rivers, suburbs: (2 if suburbs == 4 else 1) << rivers),
+}
+
+def compile_rules(rules):
     """
-    Total score is the sum of:
-      - Thicket bonus: For each thicket ('T'), bonus = 2 * 2^(# adjacent River cells).
-      - Oasis bonus: 30 points per oasis, capped at MAX_OASIS cells.
-      - Suburb bonus: Each suburb ('S') gives a base bonus of 1 (or 2 if surrounded on all 4 sides)
-        multiplied by 2^(# adjacent River cells), summed and then scaled (10×) but capped to 25 total bonus.
-      - Maquis tiles ('M') lose the thicket bonus. Here we subtract half the thicket bonus they would have given.
+    Turn SCORING_RULES into RULE_TABLE: entry t is None for tiles that don't
+    score, else (channel, values, river_values, suburb_deltas) with
+    values[rivers * 5 + suburbs] precomputed for the per-cell scorers. For the
+    bitboard scorer, river_values are the values without suburb neighbors and
+    suburb_deltas lists (suburbs, per-river-count extra) only for the suburb
+    counts that change the value, so most rules never look at suburbs.
     """
-    score = 0.0
-    # Thicket bonus:
-    for i in range(HEIGHT):
-        for j in range(WIDTH):
-            if layout[i][j] == 'T':
-                count = sum(1 for ni, nj in neighbors(i, j) if layout[ni][nj] in ['R'])
-                score += 2 * (2 ** count)
-    # Oasis bonus:
-    oasis_count = sum(1 for i in range(HEIGHT) for j in range(WIDTH) if layout[i][j]=='O')
-    score += 30 * min(oasis_count, MAX_OASIS)
-    # Suburb bonus:
-    suburb_bonus_total = 0
-    for i in range(HEIGHT):
-        for j in range(WIDTH):
-            if layout[i][j] == 'S':
-                suburb_neighbors = sum(1 for ni, nj in neighbors(i, j) if layout[ni][nj] == 'S')
-                base = 2 if suburb_neighbors == 4 else 1
-                river_count = sum(1 for ni, nj in neighbors(i, j) if layout[ni][nj] in ['R'])
-                bonus = base * (2 ** river_count)
-                suburb_bonus_total += bonus
-    suburb_score = 10 * min(suburb_bonus_total, 25)
-    score += suburb_score
-    # Maquis penalty:
-    for i in range(HEIGHT):
-        for j in range(WIDTH):
-            if layout[i][j] == 'M':
-                count = sum(1 for ni, nj in neighbors(i, j) if layout[ni][nj] in ['R'])
-                score -= 2 * (2 ** count) * 0.5
-    return score
+    table = [None] * len(TILE_CHARS)
+    for t, (channel, rule) in rules.items():
+        values = tuple(rule(r, s) for r in range(5) for s in range(5))
+        river_values = values[0::5]
+        suburb_deltas = []
+        for s in range(1, 5):
+            deltas = tuple(values[r * 5 + s] - river_values[r] for r in range(5))
+            if any(deltas):
+                suburb_deltas.append((s, deltas))
+        table[t] = (channel, values, river_values, tuple(suburb_deltas))
+    return table
+
+RULE_TABLE = compile_rules(SCORING_RULES)
+
+def channel_score(totals):
+    return (totals[THICKET_CHANNEL] - totals[MAQUIS_CHANNEL] // 2
+            + 30 * min(totals[OASIS_CHANNEL], MAX_OASIS)
+            + 10 * min(totals[SUBURB_CHANNEL], 25))
+
+def channel_stats(totals):
+    """
+    In-game stats from the channel totals:
+      - attackSpeed: thickets, oases cost 0.5, plus the Maquis bonus capped at 50
+        (Maquis stack 25 times at most).
+      - enemyAttackSpeed: -1 per oasis, minus the capped Maquis bonus.
+      - everythingHealth: 100% minus 1 per dessert.
+      - xpBonus: the suburb bonus, capped at 25.
+    """
+    maquis = min(totals[MAQUIS_CHANNEL], 50)
+    return {"attackSpeed": totals[THICKET_CHANNEL] - 0.5 * totals[OASIS_CHANNEL] + maquis,
+            "enemyAttackSpeed": -totals[OASIS_CHANNEL] - maquis,
+            "everythingHealth": 100 - totals[DESSERT_CHANNEL],
+            "xpBonus": min(totals[SUBURB_CHANNEL], 25)}
+
+# The stats a ParetoArchive trades off, each with the sign that makes larger
+# better: a lower enemy attack speed is the better one.
+PARETO_OBJECTIVES = (("attackSpeed", 1), ("enemyAttackSpeed", -1),
+                     ("everythingHealth", 1), ("xpBonus", 1))
+
+def stat_objectives(totals):
+    """The PARETO_OBJECTIVES of channel totals, as an objective vector for pareto.py."""
+    stats = channel_stats(totals)
+    return tuple(sign * stats[name] for name, sign in PARETO_OBJECTIVES)
+
+def layout_channels(layout):
+    """One pass over a layout, adding up every channel."""
+    tiles = [TILE_CODES[c] for row in layout for c in row]
+    totals = [0] * len(SCORING_RULES)
+    for k, t in enumerate(tiles):
+        rule = RULE_TABLE[t]
+        if rule is None:
+            continue
+        rivers = suburbs = 0
+        for n in BITS.neighbor_cells[k]:
+            if tiles[n] == TILE_R:
+                rivers += 1
+            elif tiles[n] == TILE_S:
+                suburbs += 1
+        totals[rule[0]] += rule[1][rivers * 5 + suburbs]
+    return totals
+
+# Scoring Functions
+def total_score_layout(layout):
+    return channel_score(layout_channels(layout))
+
+def score_and_stats(layout):
+    """total_score_layout and layout_stats from a single pass."""
+    totals = layout_channels(layout)
+    return channel_score(totals), channel_stats(totals)
 
 def total_score_state(state):
     layout = state_to_layout(state)
     return total_score_layout(layout)
 
-# Snake Moves (Connectivity Moves)
-def random_regrow(snake, trunc_index):
-    new_snake = snake[:trunc_index+1]
-    snake_set = set(new_snake)
-    head_i, head_j = new_snake[-1]
-    max_steps = 200  # safeguard
-    steps = 0
-    while steps < max_steps:
-        candidates = []
-        for ni, nj in neighbors(head_i, head_j):
-            if not active_mask[ni][nj]:
-                continue
-            if (ni, nj) in snake_set:
+# Incremental State
+
+# Undo log entry kinds: a flag change (kind, k, old_value) or a snake splice
+# (SPLICE, start, old_segment, new_length).
+SNAKE, DESSERT, SUBURB, SPLICE = range(4)
+
+class CellSet:
+    """A set of flat cell indices with O(1) add, discard and random choice."""
+    __slots__ = ("items", "pos")
+
+    def __init__(self, size):
+        self.items = []
+        self.pos = [-1] * size
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, k):
+        return self.pos[k] >= 0
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def add(self, k):
+        if self.pos[k] < 0:
+            self.pos[k] = len(self.items)
+            self.items.append(k)
+
+    def discard(self, k):
+        p = self.pos[k]
+        if p >= 0:
+            last = self.items.pop()
+            if last != k:
+                self.items[p] = last
+                self.pos[last] = p
+            self.pos[k] = -1
+
+    def choice(self):
+        return self.items[random.randrange(len(self.items))]
+
+class State:
+    """
+    Mutable annealing state: the snake (flat cell indices i * WIDTH + j),
+    the dessert and suburb flags, and the layout they produce, kept together
+    with per-cell neighbor counts so a move only rescores what it touched.
+      - Moves change flags in place; every change is appended to an undo log.
+        commit() accepts the move, undo() reverts it.
+      - Flag counts (adjacent snake cells, adjacent dessert flags) are updated
+        as soon as a flag changes and the surrounding cells are marked dirty.
+      - score() resolves the dirty cells: their tile is reclassified
+        (O/R, S, D, M/T) and any tile change updates the river, dessert and
+        suburb neighbor counts of the cells around it.
+      - The score is kept as running totals of the scoring channels (see
+        SCORING_RULES), each cell's contribution looked up in RULE_TABLE, so
+        the MAX_OASIS and suburb caps are applied in O(1).
+      - The flags are mirrored as bitboards, so snapshot() is a bit state.
+      - snake_adj is a per-cell multiset count of adjacent snake cells. It
+        drives regrowth legality, D-tile eligibility and the set of dessert
+        candidates (free cells touching the snake), which is updated as the
+        snake is truncated and regrown.
+      - The suburb frontier (free cells next to a suburb) and per-cell suburb
+        degrees are maintained as flags change, so a suburb proposal and its
+        cluster-validity check are O(1).
+      - hash is the Zobrist hash of the flags (the score does not depend on
+        the snake's order), updated with each flag change and so also by undo().
+      - A State pickles (for checkpoints) with everything it needs to carry on
+        exactly, including the order of its cell sets; the board's tables are
+        rebuilt from its mask.
+    """
+    __slots__ = ("board", "active", "active_bits", "nbrs", "snake", "in_snake", "dessert", "suburb",
+                 "snake_bits", "dessert_bits", "suburb_bits", "snake_adj", "dessert_adj",
+                 "tile", "river_adj", "d_adj", "s_adj", "channel", "value", "totals",
+                 "dirty", "log",
+                 "suburb_adj", "suburb_count", "isolated_suburbs", "frontier",
+                 "dessert_candidates", "zobrist", "hash")
+
+    def __init__(self, state, board=None):
+        size = WIDTH * HEIGHT
+        self.board = board = board if board is not None else Board()
+        self.active = board.active
+        self.active_bits = board.active_bits
+        self.nbrs = board.nbrs
+        self.snake = []
+        self.in_snake = [False] * size
+        self.dessert = [False] * size
+        self.suburb = [False] * size
+        self.snake_bits = 0
+        self.dessert_bits = 0
+        self.suburb_bits = 0
+        self.snake_adj = [0] * size
+        self.dessert_adj = [0] * size
+        self.tile = [TILE_T if a else TILE_I for a in self.active]
+        self.river_adj = [0] * size
+        self.d_adj = [0] * size
+        self.s_adj = [0] * size
+        # Every active cell starts as a thicket with no river next to it.
+        thicket_value = RULE_TABLE[TILE_T][1][0]
+        self.channel = [THICKET_CHANNEL] * size
+        self.value = [thicket_value if a else 0 for a in self.active]
+        self.totals = [0] * len(SCORING_RULES)
+        self.totals[THICKET_CHANNEL] = sum(self.value)
+        self.dirty = set()
+        self.log = []
+        self.suburb_adj = [0] * size
+        self.suburb_count = 0
+        self.isolated_suburbs = 0
+        self.frontier = CellSet(size)
+        self.dessert_candidates = CellSet(size)
+        self.zobrist = board.zobrist
+        self.hash = 0
+
+        snake, dessert_mask, suburb_mask = state
+        for i, j in snake:
+            self.snake.append(i * WIDTH + j)
+            self.set_flag(SNAKE, i * WIDTH + j, True)
+        for k in range(size):
+            if not self.active[k]:
                 continue
-            valid = True
-            for xi, xj in neighbors(ni, nj):
-                if (xi, xj) in snake_set and (xi, xj) != (head_i, head_j):
-                    valid = False
-                    break
-            if valid:
-                candidates.append((ni, nj))
-        if not candidates:
-            break
-        next_cell = random.choice(candidates)
-        new_snake.append(next_cell)
-        snake_set.add(next_cell)
-        head_i, head_j = next_cell
-        steps += 1
-    return new_snake
-
-def snake_move(state):
-    current_snake, current_dessert, current_suburb = state
-    if len(current_snake) <= 1:
-        return state
-    trunc_index = random.randint(0, len(current_snake) - 1)
-    new_snake = random_regrow(current_snake, trunc_index)
-    new_dessert = copy.deepcopy(current_dessert)
-    for (i, j) in new_snake:
-        new_dessert[i][j] = False
-    return (new_snake, new_dessert, current_suburb)
+            if dessert_mask[k // WIDTH][k % WIDTH]:
+                self.set_flag(DESSERT, k, True)
+            if suburb_mask[k // WIDTH][k % WIDTH]:
+                self.set_flag(SUBURB, k, True)
+        self.commit()
+        self.score()
 
-def dessert_move(state):
-    current_snake, current_dessert, current_suburb = state
-    snake_set = set(current_snake)
-    candidates = []
-    for i in range(HEIGHT):
-        for j in range(WIDTH):
-            if not active_mask[i][j]:
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__
+                if name not in ("active", "active_bits", "nbrs", "zobrist")}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        board = self.board
+        self.active = board.active
+        self.active_bits = board.active_bits
+        self.nbrs = board.nbrs
+        self.zobrist = board.zobrist
+
+    def set_flag(self, kind, k, value):
+        """Set one flag of cell k, recording the old value in the undo log."""
+        if kind == SNAKE:
+            old = self.in_snake[k]
+        elif kind == DESSERT:
+            old = self.dessert[k]
+        else:
+            old = self.suburb[k]
+        if old != value:
+            self.log.append((kind, k, old))
+            self._assign(kind, k, value)
+
+    def _assign(self, kind, k, value):
+        d = 1 if value else -1
+        self.dirty.add(k)
+        self.hash ^= self.zobrist[kind][k]
+        if kind == SUBURB:
+            self.suburb[k] = value
+            self.suburb_bits ^= 1 << k
+            self._update_suburb_degrees(k, d)
+            return
+        if kind == SNAKE:
+            self.in_snake[k] = value
+            self.snake_bits ^= 1 << k
+            adj = self.snake_adj
+            self._refresh_frontier(k)
+        else:
+            self.dessert[k] = value
+            self.dessert_bits ^= 1 << k
+            adj = self.dessert_adj
+        for n in self.nbrs[k]:
+            adj[n] += d
+            self.dirty.add(n)
+        if kind == SNAKE:
+            self._refresh_dessert_candidate(k)
+            for n in self.nbrs[k]:
+                self._refresh_dessert_candidate(n)
+
+    def _refresh_dessert_candidate(self, k):
+        if not self.in_snake[k] and self.snake_adj[k] and self.active[k]:
+            self.dessert_candidates.add(k)
+        else:
+            self.dessert_candidates.discard(k)
+
+    def _update_suburb_degrees(self, k, d):
+        """
+        Keep the suburb adjacency degrees, the number of isolated suburbs
+        (degree 0) and the frontier in step with suburb flag k changing by d.
+        """
+        suburb, degree = self.suburb, self.suburb_adj
+        self.suburb_count += d
+        if degree[k] == 0:
+            self.isolated_suburbs += d
+        for n in self.nbrs[k]:
+            if suburb[n]:
+                if degree[n] == 0:
+                    self.isolated_suburbs -= 1
+                elif degree[n] == 1 and d < 0:
+                    self.isolated_suburbs += 1
+            degree[n] += d
+            self._refresh_frontier(n)
+        self._refresh_frontier(k)
+
+    def _refresh_frontier(self, k):
+        if (not self.in_snake[k] and not self.suburb[k] and self.suburb_adj[k]
+                and self.active[k]):
+            self.frontier.add(k)
+        else:
+            self.frontier.discard(k)
+
+    def suburb_addition_valid(self, k):
+        """
+        Whether flagging frontier cell k as suburb keeps every suburb next to
+        another one (once there are two or more), in O(1) from the degrees.
+        """
+        if self.suburb_count <= 1 or self.isolated_suburbs == 0:
+            return True
+        fixed = sum(1 for n in self.nbrs[k] if self.suburb[n] and self.suburb_adj[n] == 0)
+        return self.isolated_suburbs == fixed
+
+    def splice(self, start, new_cells, stop=None):
+        """Replace snake[start:stop] by new_cells (order only, not flags)."""
+        self.log.append((SPLICE, start, self.snake[start:stop], len(new_cells)))
+        self.snake[start:stop] = new_cells
+
+    def regrow(self, trunc_index, max_steps=None, lookahead=False):
+        """
+        In-place random_regrow: truncate the snake after trunc_index and
+        extend it randomly without touching itself. Cells joining the snake
+        lose their dessert flag. With lookahead, cells that would leave the
+        head with no further move are only taken when nothing else is available.
+        max_steps caps the regrowth (by default the number of cells).
+        """
+        snake = self.snake
+        nbrs, in_snake, snake_adj = self.nbrs, self.in_snake, self.snake_adj
+        if trunc_index + 1 < len(snake):
+            for k in snake[trunc_index + 1:]:
+                self.set_flag(SNAKE, k, False)
+            self.splice(trunc_index + 1, ())
+        head = snake[-1]
+        steps = 0
+        if max_steps is None:
+            max_steps = len(nbrs)
+        while steps < max_steps:
+            # Next to the head, a free cell whose only snake neighbor is the head.
+            candidates = [n for n in nbrs[head] if not in_snake[n] and snake_adj[n] == 1]
+            if not candidates:
+                break
+            if lookahead and len(candidates) > 1:
+                # After stepping to n, m is a legal move if no snake cell touches it yet.
+                open_ended = [n for n in candidates
+                              if any(not snake_adj[m] and not in_snake[m] for m in nbrs[n])]
+                if open_ended:
+                    candidates = open_ended
+            head = random.choice(candidates)
+            self.set_flag(DESSERT, head, False)
+            self.set_flag(SNAKE, head, True)
+            snake.append(head)
+            steps += 1
+        if steps:
+            self.log.append((SPLICE, len(snake) - steps, [], steps))
+
+    def commit(self):
+        self.log.clear()
+
+    def undo(self, mark=0):
+        """Revert every change logged since the last commit() (or since the log had mark entries)."""
+        log = self.log
+        while len(log) > mark:
+            entry = log.pop()
+            if entry[0] == SPLICE:
+                _, start, old_segment, new_length = entry
+                self.snake[start:start + new_length] = old_segment
+            else:
+                kind, k, old = entry
+                self._assign(kind, k, old)
+
+    def snapshot(self):
+        """The state as a bit state (see state_to_bits)."""
+        return (tuple(self.snake), self.snake_bits, self.dessert_bits, self.suburb_bits)
+
+    def refresh(self):
+        """Bring the tiles of the cells touched since the last refresh up to date."""
+        if self.dirty:
+            for k in self.dirty:
+                self._retile(k)
+            self.dirty.clear()
+
+    def score(self):
+        self.refresh()
+        return channel_score(self.totals)
+
+    def _retile(self, k):
+        if not self.active[k]:
+            return
+        if self.in_snake[k]:
+            t = TILE_O if self.dessert_adj[k] else TILE_R
+        elif self.suburb[k]:
+            t = TILE_S
+        elif self.dessert[k] and self.snake_adj[k]:
+            t = TILE_D
+        elif self.d_adj[k]:
+            t = TILE_M
+        else:
+            t = TILE_T
+        old = self.tile[k]
+        if t != old:
+            self.tile[k] = t
+            for n in self.nbrs[k]:
+                if old == TILE_R:
+                    self.river_adj[n] -= 1
+                elif old == TILE_D:
+                    self.d_adj[n] -= 1
+                elif old == TILE_S:
+                    self.s_adj[n] -= 1
+                if t == TILE_R:
+                    self.river_adj[n] += 1
+                elif t == TILE_D:
+                    self.d_adj[n] += 1
+                elif t == TILE_S:
+                    self.s_adj[n] += 1
+            # A dessert appearing or disappearing can turn neighbors between T and M;
+            # river and suburb changes only alter their neighbors' bonuses.
+            if old == TILE_D or t == TILE_D:
+                for n in self.nbrs[k]:
+                    self._retile(n)
+            elif old in (TILE_R, TILE_S) or t in (TILE_R, TILE_S):
+                for n in self.nbrs[k]:
+                    self._revalue(n)
+        self._revalue(k)
+
+    def _revalue(self, k):
+        totals = self.totals
+        totals[self.channel[k]] -= self.value[k]
+        rule = RULE_TABLE[self.tile[k]]
+        if rule is None:
+            self.value[k] = 0
+            return
+        channel = rule[0]
+        value = rule[1][self.river_adj[k] * 5 + self.s_adj[k]]
+        totals[channel] += value
+        self.channel[k] = channel
+        self.value[k] = value
+
+    def layout(self):
+        self.score()
+        return [[TILE_CHARS[self.tile[i * WIDTH + j]] for j in range(WIDTH)]
+                for i in range(HEIGHT)]
+
+# Transposition Table
+class TranspositionTable:
+    """
+    Bounded LRU map from a state key (State.hash, or the flag bits of a bit
+    state) to its score, so revisited states are not rescored. Snake
+    regrowth often rebuilds the snake it just cut, and dessert toggles flip
+    straight back. hits and misses count the lookups.
+    """
+    __slots__ = ("size", "scores", "hits", "misses")
+
+    def __init__(self, size=1 << 16):
+        self.size = size
+        self.scores = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        score = self.scores.get(key)
+        if score is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.scores.move_to_end(key)
+        return score
+
+    def put(self, key, score):
+        self.scores[key] = score
+        if len(self.scores) > self.size:
+            self.scores.popitem(last=False)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+# Bitboard Backend
+# A bit state is (snake, snake_bits, dessert_bits, suburb_bits): the snake as a
+# tuple of flat cell indices plus three board-sized ints. Tiles and neighbor
+# counts are computed for the whole board at once with shift-and-mask.
+def state_to_bits(state):
+    snake, dessert_mask, suburb_mask = state
+    return (tuple(i * WIDTH + j for i, j in snake), BITS.from_cells(snake),
+            BITS.from_grid(dessert_mask), BITS.from_grid(suburb_mask))
+
+def bits_to_state(bit_state):
+    snake, _, dessert_bits, suburb_bits = bit_state
+    return ([BITS.to_cell(k) for k in snake], BITS.to_grid(dessert_bits),
+            BITS.to_grid(suburb_bits))
+
+def classify_bits(bit_state, active):
+    """
+    Same rules as state_to_layout, for every cell at once.
+    Returns the tile masks (river, oasis, dessert, maquis, thicket, suburb).
+    """
+    _, snake, dessert, suburb = bit_state
+    free = active & ~snake
+    oasis = snake & BITS.any_neighbor(dessert & free)
+    river = snake & ~oasis
+    suburbs = free & suburb
+    desserts = free & ~suburb & dessert & BITS.any_neighbor(snake)
+    rest = free & ~suburb & ~desserts
+    maquis = rest & BITS.any_neighbor(desserts)
+    thicket = rest & ~maquis
+    return river, oasis, desserts, maquis, thicket, suburbs
+
+def total_score_bits(bit_state, active):
+    """Bitboard counterpart of total_score_state."""
+    return score_tiles_bits(classify_bits(bit_state, active))
+
+def score_tiles_bits(tiles):
+    """Score the tile masks returned by classify_bits."""
+    return channel_score(channel_totals_bits(tiles))
+
+def channel_totals_bits(tiles):
+    """
+    The channel totals of classify_bits tile masks: each rule's value is
+    summed from popcounts against the exact river (and, only for rules that
+    use it, suburb) neighbor-count planes.
+    """
+    river, oasis, desserts, maquis, thicket, suburbs = tiles
+    river_counts = BITS.neighbor_counts(river)
+    suburb_counts = None
+    totals = [0] * len(SCORING_RULES)
+    for t, mask in ((TILE_T, thicket), (TILE_M, maquis), (TILE_O, oasis),
+                    (TILE_D, desserts), (TILE_S, suburbs)):
+        rule = RULE_TABLE[t]
+        if rule is None or not mask:
+            continue
+        channel, _, river_values, suburb_deltas = rule
+        parts = [(mask, river_values)]
+        if suburb_deltas:
+            if suburb_counts is None:
+                suburb_counts = BITS.neighbor_counts(suburbs)
+            parts += [(mask & suburb_counts[s], deltas) for s, deltas in suburb_deltas]
+        total = 0
+        for part, by_rivers in parts:
+            if not part:
                 continue
-            if (i, j) in snake_set:
+            if by_rivers.count(by_rivers[0]) == 5:
+                total += by_rivers[0] * popcount(part)
                 continue
-            if any((ni, nj) in snake_set for ni, nj in neighbors(i, j)):
-                candidates.append((i, j))
+            for exact, value in zip(river_counts, by_rivers):
+                if value:
+                    total += value * popcount(part & exact)
+        totals[channel] += total
+    return totals
+
+def bits_to_layout(bit_state, active):
+    layout = [['I'] * WIDTH for _ in range(HEIGHT)]
+    for tile, mask in zip("RODMTS", classify_bits(bit_state, active)):
+        for k in bit_indices(mask):
+            i, j = BITS.to_cell(k)
+            layout[i][j] = tile
+    return layout
+
+def snake_move_bits(bit_state, board, lookahead=False):
+    snake, snake_bits, dessert, suburb = bit_state
+    if len(snake) <= 1:
+        return bit_state
+    trunc_index = random.randint(0, len(snake) - 1)
+    new_snake, new_bits = regrow_bits(board.table, snake, snake_bits, trunc_index,
+                                      lookahead=lookahead)
+    return (new_snake, new_bits, dessert & ~new_bits, suburb)
+
+def dessert_move_bits(bit_state, board):
+    snake, snake_bits, dessert, suburb = bit_state
+    candidates = board.active_bits & ~snake_bits & BITS.any_neighbor(snake_bits)
     if not candidates:
-        return state
-    i, j = random.choice(candidates)
-    new_dessert = copy.deepcopy(current_dessert)
-    new_dessert[i][j] = not new_dessert[i][j]
-    return (current_snake, new_dessert, current_suburb)
-
-def valid_suburb_cluster(suburb_mask):
-    # Gather all suburb cells.
-    cells = [(i, j) for i in range(HEIGHT) for j in range(WIDTH) if suburb_mask[i][j]]
-    # If there's only one suburb tile, isolation isn't a concern.
-    if len(cells) <= 1:
+        return bit_state
+    return (snake, snake_bits, dessert ^ (1 << random_bit(candidates)), suburb)
+
+def suburb_move_bits(bit_state, board):
+    snake, snake_bits, dessert, suburb = bit_state
+    candidates = board.active_bits & ~snake_bits & ~suburb
+    if suburb:
+        candidates &= BITS.any_neighbor(suburb)
+        # An addition is only valid if it leaves no suburb without a suburb neighbor.
+        if popcount(suburb) > 1 and suburb & ~BITS.any_neighbor(suburb):
+            for k in bit_indices(candidates):
+                new_suburb = suburb | (1 << k)
+                if new_suburb & ~BITS.any_neighbor(new_suburb):
+                    candidates &= ~(1 << k)
+    if not candidates:
+        return bit_state
+    return (snake, snake_bits, dessert, suburb | (1 << random_bit(candidates)))
+
+# Snake Moves (Connectivity Moves)
+def random_regrow(snake, trunc_index, board=None, lookahead=False):
+    """
+    Truncate the snake (a list of (i, j) cells) after trunc_index and regrow it
+    randomly without touching itself, walking the compiled neighbor table.
+    """
+    if board is None:
+        board = Board()
+    flat = tuple(i * WIDTH + j for i, j in snake)
+    new_snake, _ = regrow_bits(board.table, flat, BITS.from_cells(snake), trunc_index,
+                               lookahead=lookahead)
+    return [BITS.to_cell(k) for k in new_snake]
+
+# In-place moves on a State. Each returns False when it left the state unchanged.
+def snake_move(state, lookahead=False):
+    if len(state.snake) <= 1:
+        return False
+    trunc_index = random.randint(0, len(state.snake) - 1)
+    state.regrow(trunc_index, lookahead=lookahead)
+    return True
+
+# Local snake moves. snake_move cuts at a uniform index, so half its proposals
+# regrow half the river; these change a few cells and are accepted far more
+# often late in a run.
+TAIL_SPAN = 8
+DETOUR_SPAN = 6
+CORNER_TRIES = 8
+
+def tail_move(state, lookahead=False):
+    """Cut at most TAIL_SPAN cells off the tail and regrow at most TAIL_SPAN."""
+    mark = len(state.log)
+    cut = random.randint(0, min(TAIL_SPAN, len(state.snake) - 1))
+    state.regrow(len(state.snake) - 1 - cut, max_steps=random.randint(0, TAIL_SPAN),
+                 lookahead=lookahead)
+    return len(state.log) > mark
+
+def corner_move(state, lookahead=False):
+    """
+    Flip a corner of the snake: interior cell s between a and b (diagonal to
+    each other) moves to the opposite corner a + b - s of their 2x2 square.
+    """
+    snake, in_snake, snake_adj = state.snake, state.in_snake, state.snake_adj
+    if len(snake) < 3:
+        return False
+    for _ in range(CORNER_TRIES):
+        i = random.randint(1, len(snake) - 2)
+        a, k, b = snake[i - 1:i + 2]
+        if b - a in (2, -2, 2 * WIDTH, -2 * WIDTH):
+            continue  # straight
+        c = a + b - k
+        # c touches a and b; a third snake neighbor would make the river touch itself.
+        if state.active[c] and not in_snake[c] and snake_adj[c] == 2:
+            state.set_flag(SNAKE, k, False)
+            state.set_flag(DESSERT, c, False)
+            state.set_flag(SNAKE, c, True)
+            state.splice(i, [c], i + 1)
+            return True
+    return False
+
+def detour_move(state, lookahead=False):
+    """
+    Reroute the interior of a short segment snake[i:j + 1] with a random walk
+    from snake[i] to snake[j] that leans towards snake[j], keeping both ends.
+    """
+    snake, nbrs, in_snake, snake_adj = state.snake, state.nbrs, state.in_snake, state.snake_adj
+    if len(snake) < 3:
+        return False
+    i = random.randint(0, len(snake) - 3)
+    j = min(len(snake) - 1, i + random.randint(2, DETOUR_SPAN))
+    head, target = snake[i], snake[j]
+    old = snake[i + 1:j]
+    mark = len(state.log)
+    for k in old:
+        state.set_flag(SNAKE, k, False)
+    ti, tj = divmod(target, WIDTH)
+
+    def distance(k):
+        ki, kj = divmod(k, WIDTH)
+        return abs(ki - ti) + abs(kj - tj)
+
+    path = []
+    while len(path) < len(old) + DETOUR_SPAN:
+        # A free cell touching only the head and the target closes the detour.
+        closing = [n for n in nbrs[head]
+                   if not in_snake[n] and snake_adj[n] == 2 and target in nbrs[n]]
+        if closing:
+            head = random.choice(closing)
+        else:
+            candidates = [n for n in nbrs[head] if not in_snake[n] and snake_adj[n] == 1]
+            if not candidates:
+                break
+            closer = [n for n in candidates if distance(n) < distance(head)]
+            if closer and random.random() < 0.7:
+                candidates = closer
+            head = random.choice(candidates)
+        state.set_flag(DESSERT, head, False)
+        state.set_flag(SNAKE, head, True)
+        path.append(head)
+        if closing:
+            break
+    else:
+        closing = None
+    if not closing or path == old:
+        state.undo(mark)
+        return False
+    state.splice(i + 1, path, j)
+    return True
+
+def start_move(state, lookahead=False):
+    """
+    Slide the start of the snake one cell along the border cells choose_start
+    uses (board.starts): drop the first cell if the second is also a start
+    cell, or prepend a free start cell next to the first.
+    """
+    snake, starts = state.snake, state.board.starts
+    if len(snake) > 2 and snake[1] in starts and random.random() < 0.5:
+        state.set_flag(SNAKE, snake[0], False)
+        state.splice(0, [], 1)
         return True
-    # Otherwise, every suburb cell must have at least one adjacent suburb cell.
-    for i, j in cells:
-        if not any(suburb_mask[ni][nj] for ni, nj in neighbors(i, j)):
-            return False
+    candidates = [n for n in state.nbrs[snake[0]]
+                  if n in starts and not state.in_snake[n] and state.snake_adj[n] == 1]
+    if not candidates:
+        return False
+    k = random.choice(candidates)
+    state.set_flag(DESSERT, k, False)
+    state.set_flag(SNAKE, k, True)
+    state.splice(0, [k], 0)
+    return True
+
+SNAKE_MOVES = {"snake": snake_move, "tail": tail_move, "corner": corner_move,
+               "detour": detour_move, "start": start_move}
+# Relative weights of the snake moves within random_move's snake share once
+# the annealer is colder than LOCAL_MOVES_BELOW. Hotter chains accept most
+# local moves and just drift, so until then only snake_move is used.
+SNAKE_WEIGHTS = {"snake": 2, "tail": 3, "corner": 2, "detour": 2, "start": 1}
+LOCAL_MOVES_BELOW = 2.0
+
+# Tails per multiple-try snake regrowth in solve(): more tries pick better
+# tails but cost a regrowth each, and past two the rate loss wins.
+MTM_TRIES = 2
+
+def _log_sum_exp(scores, T):
+    top = max(scores)
+    return top / T + math.log(sum(math.exp((s - top) / T) for s in scores))
+
+def mtm_snake_move(state, T, tries=MTM_TRIES, lookahead=False):
+    """
+    snake_move as a multiple-try Metropolis step at temperature T. The snake
+    is cut once at a random index; tries candidate tails are regrown from
+    that prefix on bit states (the prefix bits are shared, each tail costs a
+    regrow_bits and a whole-board bit score) and one is picked with
+    probability proportional to exp(score / T). It is accepted with the MTM
+    ratio against tries - 1 fresh tails from the same prefix plus the
+    current one; like snake_move, the cut is treated as symmetric. Only an
+    accepted tail is applied to the State, so the caller must not
+    Metropolis-test it again. Returns whether the snake changed, i.e.
+    whether the move was accepted.
+    The prefix's own score contribution is not cached: the bit score of a
+    tail (~50 us on the game board) is a fraction of its regrowth (~190 us),
+    and rescoring only the cells near the tails would take as many big-int
+    operations as the whole board, while scoring through the State (apply,
+    score, undo) costs ~1.2 ms.
+    """
+    snake = state.snake
+    if len(snake) <= 1:
+        return False
+    trunc_index = random.randint(0, len(snake) - 1)
+    old_tail = snake[trunc_index + 1:]
+    prefix = tuple(snake[:trunc_index + 1])
+    prefix_bits = state.snake_bits
+    for k in old_tail:
+        prefix_bits &= ~(1 << k)
+    table, active = state.board.table, state.active_bits
+    dessert, suburb = state.dessert_bits, state.suburb_bits
+
+    def regrow_tails(count):
+        tails = []
+        for _ in range(count):
+            cells, bits = regrow_bits(table, prefix, prefix_bits, trunc_index,
+                                      lookahead=lookahead)
+            tiles = classify_bits((cells, bits, dessert & ~bits, suburb), active)
+            tails.append((score_tiles_bits(tiles), cells[trunc_index + 1:]))
+        return tails
+
+    candidates = regrow_tails(tries)
+    top = max(score for score, _ in candidates)
+    score, new_tail = random.choices(
+        candidates, [math.exp((score - top) / T) for score, _ in candidates])[0]
+    references = [score for score, _ in regrow_tails(tries - 1)] + [state.score()]
+    log_ratio = (_log_sum_exp([score for score, _ in candidates], T)
+                 - _log_sum_exp(references, T))
+    if log_ratio < 0 and random.random() >= math.exp(log_ratio):
+        return False
+    for k in old_tail:
+        state.set_flag(SNAKE, k, False)
+    for k in new_tail:
+        state.set_flag(DESSERT, k, False)
+        state.set_flag(SNAKE, k, True)
+    state.splice(trunc_index + 1, list(new_tail))
+    return True
+
+def dessert_move(state):
+    if not state.dessert_candidates:
+        return False
+    k = state.dessert_candidates.choice()
+    state.set_flag(DESSERT, k, not state.dessert[k])
     return True
 
 def suburb_move(state):
-    current_snake, current_dessert, current_suburb = state
-    suburb_exists = any(current_suburb[i][j] for i in range(HEIGHT) for j in range(WIDTH))
-    candidates = []
-    for i in range(HEIGHT):
-        for j in range(WIDTH):
-            if not active_mask[i][j]:
-                continue
-            if (i, j) in current_snake:
-                continue
-            # Only consider cells not already marked as suburb.
-            if current_suburb[i][j]:
-                continue
-            # If a suburb already exists, new additions must be adjacent.
-            if suburb_exists:
-                if any(current_suburb[ni][nj] for ni, nj in neighbors(i, j)):
-                    # Simulate the addition.
-                    new_suburb = copy.deepcopy(current_suburb)
-                    new_suburb[i][j] = True
-                    if valid_suburb_cluster(new_suburb):
-                        candidates.append((i, j))
-            else:
-                # No suburb exists yet; any cell is allowed.
-                new_suburb = copy.deepcopy(current_suburb)
-                new_suburb[i][j] = True
-                if valid_suburb_cluster(new_suburb):
-                    candidates.append((i, j))
-    if not candidates:
-        return state
-    i, j = random.choice(candidates)
-    new_suburb = copy.deepcopy(current_suburb)
-    new_suburb[i][j] = True
-    return (current_snake, current_dessert, new_suburb)
+    if not state.suburb_count:
+        # No suburb exists yet; any free active cell is allowed.
+        if not state.active_bits & ~state.snake_bits:
+            return False
+        k = random.randrange(len(state.active))
+        while not state.active[k] or state.in_snake[k]:
+            k = random.randrange(len(state.active))
+    else:
+        # New additions must be adjacent to an existing suburb.
+        frontier = state.frontier
+        if not frontier:
+            return False
+        k = frontier.choice()
+        if not state.suburb_addition_valid(k):
+            candidates = [c for c in frontier if state.suburb_addition_valid(c)]
+            if not candidates:
+                return False
+            k = random.choice(candidates)
+    state.set_flag(SUBURB, k, True)
+    return True
+
+
+def random_move(state, lookahead=False, snake_weights=None, T=None, tries=1):
+    """
+    The move mix used by the annealers: 60% snake, 25% dessert, 15% suburb.
+    The snake share is split between the SNAKE_MOVES by snake_weights (a dict
+    like SNAKE_WEIGHTS; moves left out are never used), by default all snake_move.
+    With tries > 1, snake_move is replaced by mtm_snake_move at temperature T,
+    reported as kind "mtm": it is already accepted or rejected, and changed
+    tells which.
+    Returns (kind, changed) with kind a SNAKE_MOVES name, "mtm", "dessert" or "suburb".
+    """
+    r = random.random()
+    if r < 0.6:
+        kind = "snake"
+        if snake_weights is not None:
+            kind = random.choices(list(snake_weights), list(snake_weights.values()))[0]
+        if kind == "snake" and tries > 1:
+            return "mtm", mtm_snake_move(state, T, tries, lookahead)
+        return kind, SNAKE_MOVES[kind](state, lookahead)
+    elif r < 0.85:
+        return "dessert", dessert_move(state)
+    else:
+        return "suburb", suburb_move(state)
+
+def random_move_bits(bit_state, board, lookahead=False):
+    """
+    random_move for bit states: returns (kind, new_bit_state), the same object
+    on a no-op. Only the uniform snake_move is available here.
+    """
+    r = random.random()
+    if r < 0.6:
+        return "snake", snake_move_bits(bit_state, board, lookahead)
+    elif r < 0.85:
+        return "dessert", dessert_move_bits(bit_state, board)
+    else:
+        return "suburb", suburb_move_bits(bit_state, board)
+
+
+# Local Search
+def polish_moves(state):
+    """
+    Every move dessert_move and suburb_move could make in state, as the
+    (kind, k, value) flag change it would apply: each dessert flip next to
+    the snake and each suburb addition that keeps the cluster valid.
+    """
+    moves = [(DESSERT, k, not state.dessert[k]) for k in sorted(state.dessert_candidates)]
+    if not state.suburb_count:
+        suburbs = [k for k in range(len(state.active))
+                   if state.active[k] and not state.in_snake[k]]
+    else:
+        suburbs = [k for k in sorted(state.frontier) if state.suburb_addition_valid(k)]
+    moves.extend((SUBURB, k, True) for k in suburbs)
+    return moves
 
+def polish(state):
+    """
+    Best-improvement local search on a committed State: score every move of
+    polish_moves (each applied, scored incrementally and undone), make the
+    best strictly improving one and repeat until none improves, leaving the
+    State committed at a local optimum of dessert flips and suburb additions.
+    Returns (score, number of moves made).
+    """
+    score = state.score()
+    made = 0
+    while True:
+        best_gain, best_move = 0, None
+        for move in polish_moves(state):
+            state.set_flag(*move)
+            gain = state.score() - score
+            state.undo()
+            if gain > best_gain:
+                best_gain, best_move = gain, move
+        if best_move is None:
+            state.score()
+            return score, made
+        state.set_flag(*best_move)
+        state.commit()
+        score += best_gain
+        made += 1
+
+def polish_snapshot(bit_state, score, board, publish=None, archive=None):
+    """
+    polish() a bit state scoring score, for the annealers' best states.
+    publish and archive (as for simulated_annealing) hear of an improvement.
+    Returns (bit_state, score, number of moves made).
+    """
+    state = State(bits_to_state(bit_state), board)
+    polished, made = polish(state)
+    if polished <= score:
+        return bit_state, score, made
+    bit_state = state.snapshot()
+    if publish is not None:
+        publish(bits_to_state(bit_state), polished)
+    if archive is not None:
+        archive.offer(stat_objectives(state.totals), polished, bit_state)
+    return bit_state, polished, made
+
+# Constructive Seeding
+# River lane spacings tried by constructive_seeds: one thicket row between
+# lanes gives every thicket two river neighbors, two rows leave room for
+# desserts and suburbs.
+SEED_SPACINGS = (1, 2)
+
+def serpentine_order(spacing, offset, vertical=False, flip_i=False, flip_j=False):
+    """
+    Flat cells of an ideal serpentine river over the whole board, ignoring
+    the mask: lanes every spacing + 1 rows (columns if vertical) from offset,
+    run alternately forwards and backwards and joined at the ends. flip_i
+    and flip_j mirror it, so it can begin in any corner.
+    """
+    rows, cols = (WIDTH, HEIGHT) if vertical else (HEIGHT, WIDTH)
+    order = []
+    for n, a in enumerate(range(offset, rows, spacing + 1)):
+        line = range(cols) if n % 2 == 0 else range(cols - 1, -1, -1)
+        order.extend((a, b) for b in line)
+        if a + spacing + 1 < rows:
+            order.extend((a + d, line[-1]) for d in range(1, spacing + 1))
+    cells = []
+    for a, b in order:
+        i, j = (b, a) if vertical else (a, b)
+        if flip_i:
+            i = HEIGHT - 1 - i
+        if flip_j:
+            j = WIDTH - 1 - j
+        cells.append(i * WIDTH + j)
+    return cells
+
+def guided_snake(order, board):
+    """
+    Grow a snake that follows order (flat cells) as far as the board allows.
+    It starts from the board's start cell nearest to order[0]; each step
+    takes the legal cell (as in regrow, preferring cells that don't lead
+    into a dead end) nearest to the first cell of order that can still
+    join the snake, so blocked cells are routed around.
+    Returns the snake as a list of (i, j), or None without a start cell
+    or with an empty order.
+    """
+    if not board.starts or not order:
+        return None
+    nbrs = board.nbrs
+    in_snake = [False] * len(nbrs)
+    snake_adj = [0] * len(nbrs)
+
+    def distance(k, target):
+        return abs(k // WIDTH - target // WIDTH) + abs(k % WIDTH - target % WIDTH)
+
+    def join(k):
+        in_snake[k] = True
+        for n in nbrs[k]:
+            snake_adj[n] += 1
+
+    head = min(board.starts, key=lambda k: (distance(k, order[0]), k))
+    snake = [head]
+    join(head)
+    t = 0
+    while True:
+        candidates = [n for n in nbrs[head] if not in_snake[n] and snake_adj[n] == 1]
+        # Skip targets that are blocked, taken or touch the snake away from the head.
+        while t < len(order) and (not board.active[order[t]] or in_snake[order[t]]
+                                  or snake_adj[order[t]] and order[t] not in candidates):
+            t += 1
+        if not candidates or t == len(order):
+            break
+        open_ended = [n for n in candidates
+                      if any(not snake_adj[m] and not in_snake[m] for m in nbrs[n])]
+        if open_ended and order[t] not in candidates:
+            candidates = open_ended
+        head = min(candidates, key=lambda n: (distance(n, order[t]), n))
+        snake.append(head)
+        join(head)
+    return [divmod(k, WIDTH) for k in snake]
+
+def constructive_seeds(count=1, board=None):
+    """
+    Strong starting states built without annealing. A guided_snake along
+    every serpentine_order (each of SEED_SPACINGS and offsets, both
+    orientations, from each corner) is scored, and the count best distinct
+    snakes get their desserts and suburbs placed greedily by polish().
+    Returns up to count (snake, dessert_mask, suburb_mask) states, best
+    first; they differ in their rivers, for multi-start runs.
+    """
+    if board is None:
+        board = Board()
+    empty = init_dessert_mask()
+    snakes = {}
+    for spacing in SEED_SPACINGS:
+        for offset in range(spacing + 1):
+            for vertical in (False, True):
+                for flip_i in (False, True):
+                    for flip_j in (False, True):
+                        order = serpentine_order(spacing, offset, vertical, flip_i, flip_j)
+                        # Lanes from offset may not fit at all on a thin board.
+                        if not order:
+                            continue
+                        snake = guided_snake(order, board)
+                        if snake is not None:
+                            snakes.setdefault(frozenset(snake), snake)
+    ranked = sorted(snakes.values(),
+                    key=lambda snake: State((snake, empty, empty), board).score(), reverse=True)
+    seeds = []
+    for snake in ranked[:count]:
+        state = State((snake, empty, init_suburb_mask()), board)
+        polish(state)
+        seeds.append((state.score(), bits_to_state(state.snapshot())))
+    seeds.sort(key=lambda seed: seed[0], reverse=True)
+    return [seed for _, seed in seeds]
 
 # Simulated Annealing
-def simulated_annealing(initial_state, time_limit=300):
-    current_state = initial_state
-    current_score = total_score_state(current_state)
-    best_state = current_state
-    best_score = current_score
-
-    start_time = time.time()
-    iteration = 0
-    T0 = 100.0
-    T_end = 0.1
-    total_iterations = 500000
+def simulated_annealing(initial_state, time_limit=300, backend="incremental", board=None,
+                        lookahead=False, verbose=True, T0=100.0, total_iterations=500000,
+                        progress=None, telemetry=None, schedule=None, transpositions=None,
+                        snake_weights=None, stop=None, publish=None, checkpoint=None,
+                        checkpoint_interval=60.0, resume=None, archive=None, polish_best=True,
+                        mtm_tries=1):
+    """
+    backend selects how proposals are represented and scored:
+      - "incremental": one State changed in place and scored incrementally;
+        rejected moves are undone.
+      - "bitboard": immutable bit states scored with whole-board shift-and-mask.
+    Either way the best state is returned as a (snake, dessert_mask, suburb_mask) tuple.
+    board is the compiled active mask (built from active_mask if omitted);
+    lookahead makes snake regrowth avoid walking into dead ends.
+    verbose=False silences the progress lines. T0 and total_iterations set the
+    linear cooling ramp (a lower T0 suits warm starts from a good state); with
+    a finite time_limit the ramp is recalibrated to the measured speed so the
+    cooling always ends as time runs out. schedule, a schedules.LinearSchedule
+    or subclass, replaces that ramp, and a ReactiveSchedule may reheat,
+    restart from one of the best states found or stop early.
+    progress, if given, is called as progress(iteration, elapsed, best_score)
+    whenever the best score improves and once when the run stops.
+    telemetry, a telemetry.Telemetry, collects per-move counters and the time
+    spent in move generation, layout updates and scoring.
+    transpositions is the TranspositionTable of scores of states already seen
+    (a fresh one by default); pass TranspositionTable(0) to disable it.
+    snake_weights selects and weights the incremental backend's snake moves
+    (see random_move); by default snake_move alone is used until the
+    temperature drops below LOCAL_MOVES_BELOW and SNAKE_WEIGHTS after that.
+    stop, a threading.Event, ends the run early (keeping the best state) once
+    set; publish, if given, is called as publish(best_state, best_score) at the
+    start and whenever the best improves, for showing results as they come.
+    checkpoint is a file the run is saved to every checkpoint_interval seconds
+    and when it ends (see save_checkpoint); resume, a checkpoint from
+    load_checkpoint, continues that run instead of starting from initial_state
+    (resume_checkpoint does both).
+    archive, a pareto.ParetoArchive, is offered every accepted state as
+    (stat_objectives, score, bit state) and ends up holding the stat
+    trade-offs seen in the run; a resumed run's archive is merged into it.
+    polish_best finishes the run with polish() on the best state, so the
+    state returned is a local optimum of dessert flips and suburb additions.
+    mtm_tries > 1 makes the incremental backend's full regrowths
+    multiple-try Metropolis moves over that many tails (mtm_snake_move).
+    """
+    bitboard = backend == "bitboard"
+    if resume is not None and not bitboard:
+        board = resume["current"].board
+    if board is None:
+        board = Board()
+    active = board.active_bits
+    if resume is not None:
+        if bitboard:
+            current_state = resume["current"]
+        else:
+            state = resume["current"]
+        current_score = resume["current_score"]
+        best_state, best_score = resume["best"], resume["best_score"]
+        schedule, elites = resume["schedule"], resume["elites"]
+        iteration, elapsed = resume["iteration"], resume["elapsed"]
+        if resume.get("archive") is not None:
+            if archive is None:
+                archive = resume["archive"]
+            else:
+                archive.merge(resume["archive"])
+    else:
+        if bitboard:
+            current_state = state_to_bits(initial_state)
+            current_score = total_score_bits(current_state, active)
+            best_state = current_state
+        else:
+            state = State(initial_state, board)
+            current_score = state.score()
+            best_state = state.snapshot()
+        best_score = current_score
+        if schedule is None:
+            schedule = LinearSchedule(T0, 0.1, total_iterations,
+                                      time_limit=time_limit if math.isfinite(time_limit) else None)
+        elites = ElitePool()
+        elites.offer(best_score, best_state)
+        iteration, elapsed = 0, 0.0
+        if archive is not None:
+            archive.offer(stat_objectives(channel_totals_bits(classify_bits(best_state, active))),
+                          best_score, best_state)
+    if transpositions is None:
+        transpositions = TranspositionTable()
+    if publish is not None:
+        publish(bits_to_state(best_state), best_score)
+
+    def save():
+        save_checkpoint(checkpoint, {
+            "kind": "anneal", "backend": backend, "lookahead": lookahead,
+            "snake_weights": snake_weights, "mtm_tries": mtm_tries, "time_limit": time_limit,
+            "elapsed": time.time() - start_time, "iteration": iteration,
+            "random": random.getstate(), "schedule": schedule, "elites": elites,
+            "current": current_state if bitboard else state, "current_score": current_score,
+            "best": best_state, "best_score": best_score, "archive": archive})
+
+    if resume is not None:
+        random.setstate(resume["random"])
+    start_time = time.time() - elapsed
+    next_checkpoint = time.time() + checkpoint_interval
+    if telemetry is not None:
+        clock = time.perf_counter
+        telemetry.start()
 
     while time.time() - start_time < time_limit:
+        if stop is not None and stop.is_set():
+            if verbose:
+                print("Stopped. Keeping the best state.")
+            break
         iteration += 1
-        frac = min(1.0, iteration / total_iterations)
-        T = T0 * (1 - frac) + T_end * frac
+        T = schedule.temperature(iteration)
 
-        if T <= 0.10:
-            print("Temperature threshold reached. Stopping optimization.")
+        if T is None:
+            if verbose:
+                print("Temperature threshold reached. Stopping optimization.")
             break
 
-        r = random.random()
-        if r < 0.6:
-            new_state = snake_move(current_state)
-        elif r < 0.85:
-            new_state = dessert_move(current_state)
+        if telemetry is not None:
+            t0 = clock()
+        if bitboard:
+            kind, new_state = random_move_bits(current_state, board, lookahead)
+            changed = new_state is not current_state
         else:
-            new_state = suburb_move(current_state)
-
-        new_score = total_score_state(new_state)
+            weights = snake_weights
+            if weights is None and T < LOCAL_MOVES_BELOW:
+                weights = SNAKE_WEIGHTS
+            kind, changed = random_move(state, lookahead, weights, T, mtm_tries)
+        if telemetry is not None:
+            t1 = t2 = clock()
+        # A revisited state skips the layout update and scoring; an incremental
+        # State just keeps its dirty cells until the next miss resolves them.
+        key = new_state[1:] if bitboard else state.hash
+        new_score = transpositions.get(key)
+        if new_score is None:
+            if bitboard:
+                tiles = classify_bits(new_state, active)
+            else:
+                # Only the cells touched by the move (and their neighbors) are rescored.
+                state.refresh()
+            if telemetry is not None:
+                t2 = clock()
+            new_score = score_tiles_bits(tiles) if bitboard else state.score()
+            transpositions.put(key, new_score)
+        if telemetry is not None:
+            t3 = clock()
+            telemetry.time["move"] += t1 - t0
+            telemetry.time["layout"] += t2 - t1
+            telemetry.time["score"] += t3 - t2
         delta = new_score - current_score
 
-        if delta >= 0 or random.random() < math.exp(delta / T):
-            current_state = new_state
+        if kind == "mtm":
+            # A multiple-try move has passed its own acceptance test already:
+            # it only changed the state if it was accepted.
+            accepted = changed
+        else:
+            accepted = delta >= 0 or random.random() < math.exp(delta / T)
+        improved = accepted and new_score > best_score
+        if telemetry is not None:
+            telemetry.record(kind, changed, accepted, improved)
+        if accepted:
             current_score = new_score
-            if new_score > best_score:
-                best_state = new_state
+            if bitboard:
+                current_state = new_state
+            else:
+                state.commit()
+            if archive is not None:
+                if bitboard:
+                    totals = channel_totals_bits(classify_bits(current_state, active))
+                else:
+                    # A transposition hit leaves the totals stale until refreshed.
+                    state.refresh()
+                    totals = state.totals
+                archive.offer(stat_objectives(totals), current_score,
+                              current_state if bitboard else state.snapshot())
+            if improved:
+                # Snapshot only when the best actually improves.
+                best_state = new_state if bitboard else state.snapshot()
                 best_score = new_score
+                elites.offer(best_score, best_state)
+                if progress is not None:
+                    progress(iteration, time.time() - start_time, best_score)
+                if publish is not None:
+                    publish(bits_to_state(best_state), best_score)
+        elif not bitboard:
+            state.undo()
 
-        if iteration % 1000 == 0:
+        action = schedule.observe(iteration, improved)
+        if action is not None:
+            if verbose:
+                print(f"Iteration {iteration:6d} | Stagnated at {best_score:8.2f}: {action}")
+            if action == STOP:
+                break
+            if action == RESTART:
+                current_score, restart_state = elites.choice()
+                if bitboard:
+                    current_state = restart_state
+                else:
+                    state = State(bits_to_state(restart_state), board)
+
+        if verbose and iteration % 1000 == 0:
             print(f"Iteration {iteration:6d} | Current Score: {current_score:8.2f} | Best Score: {best_score:8.2f} | Temperature: {T:6.2f}")
-    return best_state, best_score
+        if checkpoint is not None and time.time() >= next_checkpoint:
+            save()
+            next_checkpoint = time.time() + checkpoint_interval
+    if polish_best:
+        best_state, best_score, made = polish_snapshot(best_state, best_score, board,
+                                                       publish, archive)
+        if verbose:
+            print(f"Polishing made {made} moves. Best Score: {best_score:8.2f}")
+        if telemetry is not None:
+            telemetry.extra["polish_moves"] = made
+    if checkpoint is not None:
+        save()
+    if verbose:
+        print(f"Transposition table hit rate: {transpositions.hit_rate():.1%}")
+    if telemetry is not None:
+        telemetry.extra["transposition_hits"] = transpositions.hits
+        telemetry.extra["transposition_misses"] = transpositions.misses
+        telemetry.stop()
+    if progress is not None:
+        progress(iteration, time.time() - start_time, best_score)
+    return bits_to_state(best_state), best_score
 
-# Display Final Layout (Softer Colors)
-def display_layout(layout):
-    window = tk.Tk()
-    window.title("Final Layout")
-    for i in range(HEIGHT):
-        for j in range(WIDTH):
-            cell = layout[i][j]
-            if cell == 'T':
-                bg = "PaleGreen"
-            elif cell == 'M':
-                bg = "LightGreen"
-            elif cell == 'R':
-                bg = "SkyBlue"
-            elif cell == 'O':
-                bg = "MediumTurquoise"
-            elif cell == 'D':
-                bg = "LightSalmon"
-            elif cell == 'S':
-                bg = "Khaki"
-            else:  # 'I'
-                bg = "LightGray"
-            label = tk.Label(window, text=cell, width=2, height=1,
-                             bg=bg, relief="flat", borderwidth=1)
-            label.grid(row=i, column=j, padx=1, pady=1)
-    window.mainloop()
+# Parallel Tempering
+# Worker processes rebuild the board from the mask once, in the pool initializer.
+_worker_board = None
+
+def _init_worker(mask, max_oasis):
+    global active_mask, MAX_OASIS, _worker_board
+    set_board_size(len(mask[0]), len(mask))
+    active_mask = mask
+    MAX_OASIS = max_oasis
+    _worker_board = Board(mask)
+
+def _tempering_sweep(task):
+    """
+    Run one replica for a fixed number of Metropolis steps at temperature T,
+    with the same moves as simulated_annealing: SNAKE_WEIGHTS below
+    LOCAL_MOVES_BELOW and, with mtm_tries > 1, multiple-try regrowths.
+    With archive_size, the accepted states also go through a ParetoArchive
+    of that size, whose front is returned (else None).
+    """
+    snapshot, T, iterations, seed, lookahead, archive_size, mtm_tries = task
+    random.seed(seed)
+    state = State(bits_to_state(snapshot), _worker_board)
+    score = state.score()
+    best, best_score = snapshot, score
+    archive = ParetoArchive(archive_size) if archive_size else None
+    weights = SNAKE_WEIGHTS if T < LOCAL_MOVES_BELOW else None
+    for _ in range(iterations):
+        kind, changed = random_move(state, lookahead, weights, T, mtm_tries)
+        new_score = state.score()
+        delta = new_score - score
+        if kind == "mtm":
+            # Already accepted or rejected by the move itself.
+            accepted = changed
+        else:
+            accepted = delta >= 0 or random.random() < math.exp(delta / T)
+        if accepted:
+            state.commit()
+            score = new_score
+            if score > best_score:
+                best, best_score = state.snapshot(), score
+            if archive is not None:
+                archive.offer(stat_objectives(state.totals), score, state.snapshot())
+        else:
+            state.undo()
+    front = archive.front() if archive is not None else None
+    return state.snapshot(), score, best, best_score, front
+
+def parallel_tempering(initial_state, time_limit=300, replicas=None, T_min=0.1, T_max=100.0,
+                       sweep_iterations=2000, lookahead=True, processes=None, verbose=True,
+                       stop=None, publish=None, checkpoint=None, checkpoint_interval=60.0,
+                       resume=None, archive=None, polish_best=True, mtm_tries=1):
+    """
+    Run replicas of the state at a geometric ladder of temperatures in a
+    process pool. After every sweep of sweep_iterations steps, neighboring
+    temperatures try to swap states with the replica-exchange rule
+    min(1, exp((score_hot - score_cold) * (1/T_cold - 1/T_hot))).
+    replicas defaults to the number of CPUs; initial_state may also be a list
+    of states, given to the replicas in turn. stop and publish are as for
+    simulated_annealing, as are checkpoint, resume and archive: stop is
+    checked and checkpoints are saved between sweeps, and each replica keeps
+    its own archive during a sweep, merged into archive afterwards, and so
+    are polish_best and mtm_tries. Replicas colder than LOCAL_MOVES_BELOW
+    also use the local SNAKE_WEIGHTS moves.
+    Returns (best_state, best_score, stats) where stats is layout_stats of the best layout.
+    """
+    if resume is not None:
+        temperatures = resume["temperatures"]
+        snapshots, scores = resume["snapshots"], resume["scores"]
+        best_state, best_score = resume["best"], resume["best_score"]
+        sweep, elapsed = resume["sweep"], resume["elapsed"]
+        replicas = len(temperatures)
+        if resume.get("archive") is not None:
+            if archive is None:
+                archive = resume["archive"]
+            else:
+                archive.merge(resume["archive"])
+    else:
+        if replicas is None:
+            replicas = os.cpu_count() or 1
+        replicas = max(replicas, 2)
+        ratio = (T_max / T_min) ** (1.0 / (replicas - 1))
+        temperatures = [T_min * ratio ** r for r in range(replicas)]
+        if not isinstance(initial_state, list):
+            initial_state = [initial_state]
+        starts = [state_to_bits(state) for state in initial_state]
+        snapshots = [starts[r % len(starts)] for r in range(replicas)]
+        scores = [total_score_bits(snapshot, Board().active_bits) for snapshot in snapshots]
+        best = max(range(replicas), key=scores.__getitem__)
+        best_state, best_score = snapshots[best], scores[best]
+        sweep, elapsed = 0, 0.0
+    if publish is not None:
+        publish(bits_to_state(best_state), best_score)
+
+    def save():
+        save_checkpoint(checkpoint, {
+            "kind": "tempering", "lookahead": lookahead, "sweep_iterations": sweep_iterations,
+            "mtm_tries": mtm_tries,
+            "time_limit": time_limit, "elapsed": time.time() - start_time, "sweep": sweep,
+            "random": random.getstate(), "temperatures": temperatures,
+            "snapshots": snapshots, "scores": scores,
+            "best": best_state, "best_score": best_score, "archive": archive})
+
+    if resume is not None:
+        random.setstate(resume["random"])
+    start_time = time.time() - elapsed
+    next_checkpoint = time.time() + checkpoint_interval
+    with multiprocessing.Pool(processes or min(replicas, os.cpu_count() or 1),
+                              initializer=_init_worker,
+                              initargs=(active_mask, MAX_OASIS)) as pool:
+        while time.time() - start_time < time_limit and not (stop is not None and stop.is_set()):
+            sweep += 1
+            archive_size = archive.size if archive is not None else 0
+            tasks = [(snapshots[r], temperatures[r], sweep_iterations,
+                      random.getrandbits(64), lookahead, archive_size, mtm_tries)
+                     for r in range(replicas)]
+            improved = False
+            for r, (snapshot, score, best, replica_best, front) in enumerate(
+                    pool.map(_tempering_sweep, tasks)):
+                snapshots[r], scores[r] = snapshot, score
+                if replica_best > best_score:
+                    best_state, best_score = best, replica_best
+                    improved = True
+                if front is not None:
+                    for entry in front:
+                        archive.offer(*entry)
+            if improved and publish is not None:
+                publish(bits_to_state(best_state), best_score)
+            # Alternate even and odd pairs so every neighbor pair gets a chance.
+            for r in range(sweep % 2, replicas - 1, 2):
+                beta_gap = 1.0 / temperatures[r] - 1.0 / temperatures[r + 1]
+                exponent = (scores[r + 1] - scores[r]) * beta_gap
+                if exponent >= 0 or random.random() < math.exp(exponent):
+                    snapshots[r], snapshots[r + 1] = snapshots[r + 1], snapshots[r]
+                    scores[r], scores[r + 1] = scores[r + 1], scores[r]
+            if verbose:
+                print(f"Sweep {sweep:4d} | Coldest Score: {scores[0]:8.2f} | "
+                      f"Best Score: {best_score:8.2f}")
+            if checkpoint is not None and time.time() >= next_checkpoint:
+                save()
+                next_checkpoint = time.time() + checkpoint_interval
+    if polish_best:
+        best_state, best_score, made = polish_snapshot(best_state, best_score, Board(),
+                                                       publish, archive)
+        if verbose:
+            print(f"Polishing made {made} moves. Best Score: {best_score:8.2f}")
+    if checkpoint is not None:
+        save()
+    best_state = bits_to_state(best_state)
+    return best_state, best_score, layout_stats(state_to_layout(best_state))
+
+# Checkpoints
+CHECKPOINT_VERSION = 2
+
+def save_checkpoint(path, run):
+    """
+    Write the run dict built by simulated_annealing or parallel_tempering
+    (current and best states, schedule, iteration, RNG state, ...) to path,
+    after a header with the active_mask and MAX_OASIS it belongs to. The file
+    is replaced atomically, so a process killed mid-write keeps the previous one.
+    """
+    header = {"version": CHECKPOINT_VERSION, "mask": active_mask, "max_oasis": MAX_OASIS}
+    partial = path + ".tmp"
+    with open(partial, "wb") as f:
+        pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(run, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(partial, path)
+
+def checkpoint_board(path):
+    """The (mask, max_oasis) a checkpoint belongs to, without loading the run."""
+    with open(path, "rb") as f:
+        header = pickle.load(f)
+    if header.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"{path} is not a version {CHECKPOINT_VERSION} checkpoint")
+    return header["mask"], header["max_oasis"]
+
+def load_checkpoint(path):
+    """
+    Read a checkpoint written by save_checkpoint (it is a pickle: only load
+    your own). The run only makes sense on its own board, so the module is
+    switched to it first: its size, active_mask and MAX_OASIS.
+    """
+    global active_mask, MAX_OASIS
+    mask, max_oasis = checkpoint_board(path)
+    set_board_size(len(mask[0]), len(mask))
+    active_mask, MAX_OASIS = mask, max_oasis
+    with open(path, "rb") as f:
+        pickle.load(f)
+        return pickle.load(f)
+
+def resume_checkpoint(path, time_limit=None, **kwargs):
+    """
+    Continue the run saved at path on its own board, with its original
+    options, saving back to path (unless kwargs name another checkpoint).
+    time_limit counts the time already run and defaults to the original
+    budget; kwargs (verbose, stop, publish, ...) go to the annealer.
+    Returns what the interrupted call would have.
+    """
+    run = load_checkpoint(path)
+    if time_limit is None:
+        time_limit = run["time_limit"]
+    kwargs.setdefault("checkpoint", path)
+    if run["kind"] == "tempering":
+        return parallel_tempering(None, time_limit, sweep_iterations=run["sweep_iterations"],
+                                  lookahead=run["lookahead"], mtm_tries=run.get("mtm_tries", 1),
+                                  resume=run, **kwargs)
+    return simulated_annealing(None, time_limit, backend=run["backend"],
+                               lookahead=run["lookahead"], snake_weights=run["snake_weights"],
+                               mtm_tries=run.get("mtm_tries", 1),
+                               resume=run, **kwargs)
+
+def layout_stats(layout):
+    """In-game stats of a layout (see channel_stats)."""
+    return channel_stats(layout_channels(layout))
+
+# Headless Solving
+# Cooling used when a near-miss cache entry or constructive_seeds seeds the run;
+# a near miss gets a fixed ramp of WARM_START_ITERATIONS instead of the budget.
+WARM_START_T0 = 5.0
+WARM_START_ITERATIONS = 20000
+# Most constructive seeds a multi-start solve builds.
+MAX_SEEDS = 8
+# Size of the Pareto front main reports alongside the best layout.
+PARETO_SIZE = 30
+
+def default_cache_path():
+    return os.path.join(os.path.expanduser("~"), ".loop_hero_solutions.sqlite")
+
+def default_checkpoint_path():
+    return os.path.join(os.path.expanduser("~"), ".loop_hero_checkpoint.pickle")
+
+def solve(mask, max_oasis=50, time_limit=300, seed=None, replicas=1, cache=None,
+          verbose=False, stop=None, publish=None, checkpoint=None, pareto_size=0, chains=1):
+    """
+    Solve one board without any UI. mask is a grid of booleans (True = active)
+    of any size (see set_board_size); it becomes the module's active_mask and
+    max_oasis its MAX_OASIS. replicas > 1 uses parallel_tempering instead of
+    one chain, and chains > 1 multichain.multichain_annealing (NumPy; it
+    does not checkpoint).
+    With a SolutionCache, an exact hit (up to mirroring) is returned at once
+    and a near miss is repaired to this mask and used as a warm start; the
+    result is stored back in the cache unless stop ended the run. Otherwise
+    the search starts, just as cool, from constructive_seeds (one per
+    replica or chain).
+    Returns a dict with the layout (one string per row), score, stats, snake,
+    how the cache was used ("hit", "warm" or "miss") and whether stop ended
+    the run ("stopped").
+    stop, a threading.Event, ends the search early with the best layout so
+    far; publish, if given, is called with a result dict (cache "live") for
+    the starting layout and each better one found.
+    checkpoint is a file the search is saved to as it goes. If it already
+    holds a run for this mask and max_oasis, that run is resumed (with its
+    own solver and options) instead, and the result has "resumed": True.
+    With pareto_size, the result's "pareto" also lists (as dicts with layout,
+    score, stats and snake, best score first) up to that many layouts whose
+    stats no other layout seen in the run beats on every count.
+    """
+    global active_mask, MAX_OASIS
+    if not mask or any(len(row) != len(mask[0]) for row in mask):
+        raise ValueError("mask must be a non-empty grid with rows of equal length")
+    set_board_size(len(mask[0]), len(mask))
+    active_mask = [[bool(cell) for cell in row] for row in mask]
+    MAX_OASIS = max(0, min(int(max_oasis), 50))
+    if seed is not None:
+        random.seed(seed)
+    board = Board()
+    initial_state = None
+    cache_use = "miss"
+    if cache is not None:
+        from solution_cache import repair
+        hit = cache.get(board.active_bits, MAX_OASIS)
+        if hit is not None:
+            result = _solve_result(bits_to_state(hit[0]), "hit")
+            if pareto_size:
+                result["pareto"] = [_layout_result(bits_to_state(hit[0]))]
+            return result
+    live = None
+    if publish is not None:
+        live = lambda state, score: publish(_solve_result(state, "live"))
+    archive = ParetoArchive(pareto_size) if pareto_size else None
+    options = {"verbose": verbose, "stop": stop, "publish": live, "checkpoint": checkpoint,
+               "archive": archive}
+    resumed = False
+    if checkpoint is not None and os.path.exists(checkpoint):
+        # A checkpoint of another board, of an older version or that can't be
+        # read at all is simply overwritten.
+        try:
+            resumed = checkpoint_board(checkpoint) == (active_mask, MAX_OASIS)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            resumed = False
+    if resumed:
+        if verbose:
+            print("Resuming the run saved in", checkpoint)
+        best_state = resume_checkpoint(checkpoint, time_limit, **options)[0]
+    else:
+        if cache is not None:
+            near = cache.nearest(board.active_bits, MAX_OASIS)
+            if near is not None:
+                repaired = repair(BITS, board.active_bits, near[1])
+                if repaired is not None:
+                    initial_state = bits_to_state(repaired)
+                    cache_use = "warm"
+        seeds = [initial_state]
+        if initial_state is None:
+            seeds = constructive_seeds(min(max(replicas, chains), MAX_SEEDS), board)
+            if not seeds:
+                raise ValueError("No active border cell available!")
+            initial_state = seeds[0]
+        if verbose:
+            print("Initial snake length:", len(initial_state[0]),
+                  "Score:", total_score_state(initial_state))
+        if cache_use == "warm":
+            # A repaired near miss only needs a short ramp, not one stretched
+            # over the whole budget; time_limit stays the deadline.
+            schedule = LinearSchedule(WARM_START_T0, 0.1, WARM_START_ITERATIONS)
+            best_state, _ = simulated_annealing(initial_state, time_limit, board=board,
+                                                lookahead=True, schedule=schedule,
+                                                mtm_tries=MTM_TRIES, **options)
+        elif replicas > 1:
+            best_state, _, _ = parallel_tempering(seeds, time_limit, replicas,
+                                                  mtm_tries=MTM_TRIES, **options)
+        elif chains > 1:
+            from multichain import multichain_annealing
+            del options["checkpoint"]
+            best_state, _ = multichain_annealing(seeds, chains, time_limit, board=board,
+                                                 lookahead=True, T0=WARM_START_T0, **options)
+        else:
+            schedule = ReactiveSchedule(T0=WARM_START_T0, time_limit=time_limit)
+            best_state, _ = simulated_annealing(initial_state, time_limit, board=board,
+                                                lookahead=True, schedule=schedule,
+                                                mtm_tries=MTM_TRIES, **options)
+    result = _solve_result(best_state, cache_use)
+    result["resumed"] = resumed
+    result["stopped"] = stop is not None and stop.is_set()
+    if archive is not None:
+        result["pareto"] = [_layout_result(bits_to_state(bit_state))
+                            for _, _, bit_state in archive.front()]
+    # A stopped run's best is partial: caching it would turn the next solve
+    # into a hit, while its checkpoint lets that solve resume the run.
+    if cache is not None and not result["stopped"]:
+        cache.put(board.active_bits, MAX_OASIS, state_to_bits(best_state), result["score"])
+    return result
+
+def _layout_result(state):
+    layout = state_to_layout(state)
+    score, stats = score_and_stats(layout)
+    return {"score": score, "stats": stats,
+            "layout": ["".join(row) for row in layout],
+            "snake": [list(cell) for cell in state[0]]}
+
+def _solve_result(state, cache_use):
+    result = _layout_result(state)
+    result["cache"] = cache_use
+    return result
 
 # Main
 def main():
-    run_selection()
-    start = choose_start()
-    if start is None:
-        messagebox.showerror("Error", "No active border cell available!")
+    global MAX_OASIS
+    from gui import run_selection, run_live, show_error
+    from solution_cache import SolutionCache
+    selector = run_selection(active_mask, ask_max_oasis=True)
+    if selector.max_oasis is not None:
+        MAX_OASIS = selector.max_oasis
+    if choose_start() is None:
+        show_error("No active border cell available!")
         return
 
-    initial_snake = [start]
-    initial_snake = random_regrow(initial_snake, 0)
-    initial_dessert = init_dessert_mask()
-    initial_suburb = init_suburb_mask()
-    initial_state = (initial_snake, initial_dessert, initial_suburb)
-    init_score = total_score_state(initial_state)
-    print("Initial snake length:", len(initial_snake), "Score:", init_score)
-
-    best_state, best_score = simulated_annealing(initial_state, time_limit=300)
-    best_layout = state_to_layout(best_state)
-    print("Best snake length:", len(best_state[0]), "Best Score:", best_score)
-
-    # Final stats calculation
-    attackSpeed = 0
-    enemyAttackSpeed = 0
-    everythingHealth = 100
-    maquis_attack_bonus = 0
-    maquis_enemy_bonus = 0
-    xp_bonus_total = 0
-    for i in range(HEIGHT):
-        for j in range(WIDTH):
-            if best_layout[i][j] == 'T':
-                count = sum(1 for ni, nj in neighbors(i, j) if best_layout[ni][nj] in ['R'])
-                attackSpeed += 2 * (2 ** count)
-            elif best_layout[i][j] == 'M':
-                count = sum(1 for ni, nj in neighbors(i, j) if best_layout[ni][nj] in ['R'])
-                bonus = 2 * (2 ** count)
-                maquis_attack_bonus += bonus
-                maquis_enemy_bonus += bonus
-            elif best_layout[i][j] == 'D':
-                everythingHealth += -1
-            elif best_layout[i][j] == 'O':
-                attackSpeed -= 0.5
-                enemyAttackSpeed -= 1
-            elif best_layout[i][j] == 'S':
-                suburb_neighbors = sum(1 for ni, nj in neighbors(i, j) if best_layout[ni][nj] == 'S')
-                base = 2 if suburb_neighbors == 4 else 1
-                river_count = sum(1 for ni, nj in neighbors(i, j) if best_layout[ni][nj] in ['R'])
-                xp_bonus_total += base * (2 ** river_count)
-    # Cap maquis stacking (25 times max, so bonus capped at 50)
-    maquis_attack_bonus = min(maquis_attack_bonus, 50)
-    maquis_enemy_bonus = min(maquis_enemy_bonus, 50)
-    attackSpeed += maquis_attack_bonus
-    enemyAttackSpeed -= maquis_enemy_bonus
-    xp_bonus_total = min(xp_bonus_total, 25)
-
-    print(f"Attack Speed: {attackSpeed}, Enemy Attack Speed: {enemyAttackSpeed}, Everything's Health: {everythingHealth}%")
-    print(f"XP Bonus per kill: {xp_bonus_total}")
-    display_layout(best_layout)
+    def run(stop, publish):
+        # The cache's connection belongs to the thread that opens it.
+        cache = SolutionCache(default_cache_path(), WIDTH, HEIGHT)
+        try:
+            # Use every core when there is more than one; otherwise anneal a single chain.
+            # A run cut short (window closed, process killed) on this board resumes.
+            return solve(active_mask, MAX_OASIS, time_limit=300, replicas=os.cpu_count() or 1,
+                         cache=cache, verbose=True, stop=stop, publish=publish,
+                         checkpoint=default_checkpoint_path(), pareto_size=PARETO_SIZE)
+        finally:
+            cache.close()
+
+    # The solver runs on a worker thread; the window shows the best layout so far.
+    result = run_live(run, describe_result, HEIGHT, WIDTH)
+    if result is None:
+        return
+    if result["cache"] == "hit":
+        print("Found this board in the solution cache.")
+    print("Best snake length:", len(result["snake"]), "Best Score:", result["score"])
+
+    stats = result["stats"]
+    print(f"Attack Speed: {stats['attackSpeed']}, Enemy Attack Speed: {stats['enemyAttackSpeed']}, "
+          f"Everything's Health: {stats['everythingHealth']}%")
+    print(f"XP Bonus per kill: {stats['xpBonus']}")
+    print_pareto(result["pareto"])
+
+def print_pareto(front):
+    """Print the stats of each layout of a Pareto front (see solve) and the layout itself."""
+    print(f"\nOther trade-offs found ({len(front)} layouts no other beats on every stat):")
+    for number, entry in enumerate(front, 1):
+        stats = entry["stats"]
+        print(f"#{number}: Score {entry['score']}, Attack Speed {stats['attackSpeed']}, "
+              f"Enemy Attack Speed {stats['enemyAttackSpeed']}, "
+              f"Everything's Health {stats['everythingHealth']}%, XP Bonus {stats['xpBonus']}")
+        for row in entry["layout"]:
+            print("   ", row)
+
+def describe_result(result):
+    """The stats lines shown under the live layout."""
+    stats = result["stats"]
+    return [f"Score: {result['score']}",
+            f"Attack Speed: {stats['attackSpeed']}, Enemy Attack Speed: "
+            f"{stats['enemyAttackSpeed']}, Everything's Health: {stats['everythingHealth']}%",
+            f"XP Bonus per kill: {stats['xpBonus']}"]
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Headless batch solver: reads board configurations as JSON lines, solves
+them concurrently in a process pool and streams one JSON line per result.
+
+Each input line is an object such as
+    {"id": "run-7", "mask": ["....#...", ...], "max_oasis": 20}
+where mask has one string per row, '.' for an active cell and '#' for a
+cell you can't build on (a list of lists of booleans also works). Boards
+may be any size; the game's is 21 x 12.
+Optional keys: "solver" ("full" or "river"), "time_limit" and "seed"; river
+boards may add "exact": true to follow annealing with the frontier DP solver,
+and full-solver boards "pareto": N to also get up to N layouts trading the
+stats off against each other (see FullForceVersion.solve) or "chains": K
+to anneal K chains at once with the NumPy engine in multichain.py.
+With --cache, full-solver boards are looked up in (and added to) a
+persistent solution cache. With --checkpoint-dir (or a "checkpoint" file
+per line), full-solver runs are saved as they go and a rerun of the same
+board picks up where a killed worker left off.
+
+Usage:
+    python batch.py boards.jsonl more.jsonl --workers 8 > results.jsonl
+    cat boards.jsonl | python batch.py --solver river
+"""
+import argparse, json, multiprocessing, os, sys, time
+
+import FullForceVersion
+import riverThicket
+from solution_cache import SolutionCache
+
+SOLVERS = {"full": FullForceVersion, "river": riverThicket}
+
+
+def parse_mask(mask):
+    """Turn '.'/'#' row strings (or rows of booleans) into a grid of booleans."""
+    grid = []
+    for row in mask:
+        if isinstance(row, str):
+            grid.append([cell != '#' for cell in row])
+        else:
+            grid.append([bool(cell) for cell in row])
+    return grid
+
+
+def read_tasks(paths, defaults):
+    """
+    Yield one task dict per non-blank input line, numbering lines without an
+    id. A line that is not a JSON object yields {"id": ..., "error": ...}
+    instead, so one bad line doesn't abort the batch.
+    """
+    count = 0
+    for path in paths:
+        handle = sys.stdin if path == '-' else open(path)
+        try:
+            for number, line in enumerate(handle, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    fields = json.loads(line)
+                    if not isinstance(fields, dict):
+                        raise ValueError("expected a JSON object")
+                except ValueError as error:
+                    yield {"id": count, "error": f"{path} line {number}: {error}"}
+                    count += 1
+                    continue
+                task = dict(defaults)
+                task.update(fields)
+                task.setdefault("id", count)
+                count += 1
+                yield task
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+
+def solve_task(task):
+    """Pool worker: solve one task and return its JSON-ready result."""
+    started = time.time()
+    result = {"id": task["id"], "solver": task["solver"]}
+    try:
+        mask = parse_mask(task["mask"])
+        if task["solver"] == "full":
+            cache = None
+            if task.get("cache"):
+                cache = SolutionCache(task["cache"], len(mask[0]), len(mask))
+            try:
+                result.update(FullForceVersion.solve(mask, task.get("max_oasis", 50),
+                                                      task["time_limit"], task.get("seed"),
+                                                      cache=cache,
+                                                      checkpoint=task.get("checkpoint"),
+                                                      pareto_size=task.get("pareto", 0),
+                                                      chains=task.get("chains", 1)))
+            finally:
+                if cache is not None:
+                    cache.close()
+            result["max_oasis"] = FullForceVersion.MAX_OASIS
+        elif task["solver"] == "river":
+            result.update(riverThicket.solve(mask, task["time_limit"], task.get("seed"),
+                                             task.get("exact", False)))
+        else:
+            raise ValueError(f"unknown solver {task['solver']!r}")
+    except Exception as error:
+        # Whatever goes wrong (a bad mask, an unreadable cache or checkpoint,
+        # a missing optional dependency) only fails this task.
+        result["error"] = str(error)
+    result["elapsed"] = round(time.time() - started, 3)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("inputs", nargs="*", default=["-"],
+                        help="JSON-lines files of boards ('-' or nothing for stdin)")
+    parser.add_argument("--solver", choices=sorted(SOLVERS), default="full",
+                        help="default solver for lines that don't name one")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="default seconds per board (300 full, 120 river)")
+    parser.add_argument("--cache", default=None,
+                        help="SQLite solution cache for full-solver boards (exact and "
+                             "mirrored hits return at once, near misses warm-start)")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="save full-solver runs to <dir>/<id>.checkpoint as they go and "
+                             "resume them from there when rerun")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of boards solved at once")
+    args = parser.parse_args(argv)
+
+    if args.checkpoint_dir is not None:
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+    defaults = {"solver": args.solver, "cache": args.cache}
+    if args.time_limit is not None:
+        defaults["time_limit"] = args.time_limit
+    tasks = []
+    for task in read_tasks(args.inputs, defaults):
+        if "error" in task:
+            sys.stdout.write(json.dumps(task) + "\n")
+            continue
+        task.setdefault("time_limit", 300 if task["solver"] == "full" else 120)
+        if args.checkpoint_dir is not None:
+            task.setdefault("checkpoint",
+                            os.path.join(args.checkpoint_dir, f"{task['id']}.checkpoint"))
+        tasks.append(task)
+
+    with multiprocessing.Pool(max(1, args.workers)) as pool:
+        for result in pool.imap_unordered(solve_task, tasks):
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmarks for riverThicket.py and FullForceVersion.py.
+
+Every case of a fixed corpus of boards (empty board, scattered blocked
+cells, dense obstacles; several MAX_OASIS values for the full solver) is
+annealed with a seeded RNG for a fixed time budget. For each case the
+suite reports iterations per second, the best score and the best-score
+versus wall-time curve, and for the full solver the average cost of one
+proposal (move + score + undo) per move type. With --telemetry each case
+also carries the annealer's per-move counters and phase timings; with
+--gap river cases are also run through the frontier DP solver, seeded with the
+annealed river and given the same budget, to show how far annealing falls
+short of the optimum.
+--sizes runs the corpus on larger synthetic boards too, to show how the
+iteration rate, move costs and scores scale with the board area. --chains K
+adds every full-solver case again run by the NumPy multi-chain engine with K
+chains (its iterations count the proposals of all chains). --start
+constructive starts the full-solver cases from constructive_seeds, as
+solve() does, at the warm-start temperature instead of from a random snake.
+
+Usage:
+    python benchmark.py --budget 20 --save baseline.json
+    python benchmark.py --budget 20 --compare baseline.json
+    python benchmark.py --budget 20 --sizes 21x12,42x24,84x48
+    python benchmark.py --budget 20 --only oasis10 --chains 256
+"""
+import argparse, json, platform, random, sys, time
+
+import FullForceVersion
+import riverThicket
+from schedules import ReactiveSchedule
+from telemetry import Telemetry
+
+# Fraction of blocked cells and RNG seed that generate each corpus mask.
+BOARDS = {
+    "empty": (0.0, 0),
+    "scattered": (0.08, 1),
+    "dense": (0.3, 2),
+}
+OASIS_LIMITS = (50, 10, 0)
+MOVE_SAMPLES = 2000
+GAME_SIZE = (21, 12)
+
+
+def corpus_mask(name, width, height):
+    """The fixed mask for a corpus board, blocked cells drawn with a private RNG."""
+    blocked, seed = BOARDS[name]
+    rng = random.Random(seed)
+    mask = [[rng.random() >= blocked for _ in range(width)] for _ in range(height)]
+    # Keep the start rows on the left and right borders usable.
+    for i in range(1, height - 1):
+        mask[i][0] = mask[i][width - 1] = True
+    return mask
+
+
+def cases(sizes=(GAME_SIZE,), chains=0):
+    for size in sizes:
+        for board in BOARDS:
+            yield {"solver": "river", "board": board, "size": size}
+            for max_oasis in OASIS_LIMITS:
+                yield {"solver": "full", "board": board, "max_oasis": max_oasis, "size": size}
+                if chains:
+                    yield {"solver": "multichain", "board": board, "max_oasis": max_oasis,
+                           "size": size, "chains": chains}
+
+
+def case_name(case):
+    if case["solver"] == "full":
+        name = f"full/{case['board']}/oasis{case['max_oasis']}"
+    elif case["solver"] == "multichain":
+        name = f"multichain{case['chains']}/{case['board']}/oasis{case['max_oasis']}"
+    else:
+        name = f"river/{case['board']}"
+    # Game-size cases keep their original names so old baselines still compare.
+    if case["size"] != GAME_SIZE:
+        width, height = case["size"]
+        name += f"@{width}x{height}"
+    return name
+
+
+def parse_sizes(text):
+    """'21x12,42x24' -> [(21, 12), (42, 24)]"""
+    return [tuple(int(n) for n in size.split("x")) for size in text.split(",")]
+
+
+def time_moves(state):
+    """Average seconds per proposal (move, score, undo) for each move type."""
+    moves = {name: (lambda move=move: move(state, True))
+             for name, move in FullForceVersion.SNAKE_MOVES.items()}
+    moves["mtm"] = lambda: FullForceVersion.mtm_snake_move(state, 1.0, lookahead=True)
+    moves["dessert"] = lambda: FullForceVersion.dessert_move(state)
+    moves["suburb"] = lambda: FullForceVersion.suburb_move(state)
+    costs = {}
+    for name, move in moves.items():
+        started = time.perf_counter()
+        for _ in range(MOVE_SAMPLES):
+            move()
+            state.score()
+            state.undo()
+        costs[name] = (time.perf_counter() - started) / MOVE_SAMPLES
+    return costs
+
+
+def run_case(case, budget, seed, telemetry=False, gap=False, schedule="linear",
+             start="random"):
+    curve = []
+    last = {}
+    recorder = Telemetry() if telemetry else None
+
+    def progress(iteration, elapsed, best_score):
+        curve.append((round(elapsed, 4), best_score))
+        last["iterations"] = iteration
+
+    random.seed(seed)
+    result = {"case": case_name(case), "seed": seed, "budget": budget}
+    if case["solver"] == "river":
+        module = riverThicket
+        module.set_board_size(*case["size"])
+        module.active_mask = corpus_mask(case["board"], module.WIDTH, module.HEIGHT)
+        table = module.compile_board()
+        snake = module.random_regrow([module.choose_start()], 0, table)
+        started = time.time()
+        best_snake, best_score = module.simulated_annealing(
+            snake, budget, table=table, lookahead=True, verbose=False, progress=progress,
+            telemetry=recorder,
+            schedule=module.reactive_schedule(budget) if schedule == "reactive" else None)
+        elapsed = time.time() - started
+        if gap:
+            # As in riverThicket.solve, the search gets as long as the annealing.
+            _, optimum, certified = module.frontier_dp(best_snake[0], incumbent=best_snake,
+                                                       verbose=False, time_limit=budget)
+            result.update({"optimum": optimum, "certified": certified})
+    else:
+        module = FullForceVersion
+        module.set_board_size(*case["size"])
+        module.active_mask = corpus_mask(case["board"], module.WIDTH, module.HEIGHT)
+        module.MAX_OASIS = case["max_oasis"]
+        board = module.Board()
+        started = time.time()
+        T0 = 100.0
+        if start == "constructive":
+            # Seeding counts against the budget: it is part of the time to quality.
+            state = module.constructive_seeds(1, board)[0]
+            T0 = module.WARM_START_T0
+        else:
+            state = (module.random_regrow([module.choose_start()], 0, board),
+                     module.init_dessert_mask(), module.init_suburb_mask())
+        remaining = budget - (time.time() - started)
+    if case["solver"] == "multichain":
+        from multichain import multichain_annealing
+        best_state, best_score = multichain_annealing(
+            state, case["chains"], remaining, board=board, lookahead=True, verbose=False,
+            T0=T0, progress=progress)
+        elapsed = time.time() - started
+    elif case["solver"] == "full":
+        best_state, best_score = module.simulated_annealing(
+            state, remaining, board=board, lookahead=True, verbose=False, progress=progress,
+            telemetry=recorder, T0=T0,
+            schedule=ReactiveSchedule(T0=T0, time_limit=remaining)
+            if schedule == "reactive" else None)
+        elapsed = time.time() - started
+        random.seed(seed)
+        result["move_cost"] = time_moves(module.State(best_state, board))
+    result.update({"best_score": best_score, "iterations": last.get("iterations", 0),
+                   "seconds": round(elapsed, 3),
+                   "iterations_per_second": round(last.get("iterations", 0) / elapsed, 1),
+                   "curve": curve})
+    if recorder is not None:
+        result["telemetry"] = recorder.as_dict()
+    return result
+
+
+def compare(results, baseline):
+    """Print speed and score ratios against a saved baseline."""
+    old = {r["case"]: r for r in baseline["results"]}
+    print(f"{'case':34s} {'it/s ratio':>10s} {'score delta':>12s}")
+    for r in results:
+        b = old.get(r["case"])
+        if b is None:
+            print(f"{r['case']:34s} {'(new)':>10s}")
+            continue
+        speed = float("nan")
+        if b["iterations_per_second"]:
+            speed = r["iterations_per_second"] / b["iterations_per_second"]
+        print(f"{r['case']:34s} {speed:10.2f} {r['best_score'] - b['best_score']:12.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--budget", type=float, default=10.0, help="seconds per case")
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--only", default=None,
+                        help="run only cases whose name contains this text (e.g. 'river')")
+    parser.add_argument("--save", default=None, help="write results as a JSON baseline")
+    parser.add_argument("--compare", default=None, help="compare against a JSON baseline")
+    parser.add_argument("--schedule", choices=["linear", "reactive"], default="linear",
+                        help="cooling schedule (see schedules.py)")
+    parser.add_argument("--gap", action="store_true",
+                        help="also solve river cases with the frontier DP (for up to the budget "
+                             "again) and report the gap")
+    parser.add_argument("--telemetry", action="store_true",
+                        help="record per-move counters and phase timings for each case")
+    parser.add_argument("--sizes", type=parse_sizes, default=[GAME_SIZE],
+                        help="comma-separated board sizes WIDTHxHEIGHT (default 21x12)")
+    parser.add_argument("--start", choices=["random", "constructive"], default="random",
+                        help="how full-solver cases get their initial layout")
+    parser.add_argument("--chains", type=int, default=0,
+                        help="also run the full-solver cases with this many NumPy chains")
+    args = parser.parse_args(argv)
+
+    results = []
+    for case in cases(args.sizes, args.chains):
+        if args.only and args.only not in case_name(case):
+            continue
+        r = run_case(case, args.budget, args.seed, args.telemetry, args.gap,
+                     args.schedule, args.start)
+        results.append(r)
+        line = (f"{r['case']:34s} {r['iterations_per_second']:10.1f} it/s "
+                f"best {r['best_score']:8.1f}")
+        if "optimum" in r:
+            line += f"  optimum {r['optimum']:8.1f}" + ("" if r["certified"] else " (beam)")
+        if "move_cost" in r:
+            line += "  " + " ".join(f"{k} {v * 1e6:7.1f}us" for k, v in r["move_cost"].items())
+        print(line)
+        sys.stdout.flush()
+
+    report = {"python": platform.python_version(), "machine": platform.machine(),
+              "budget": args.budget, "seed": args.seed, "schedule": args.schedule, "start": args.start,
+              "sizes": args.sizes, "chains": args.chains, "results": results}
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Bitboard helpers shared by riverThicket.py and FullForceVersion.py.
+
+A whole board fits in one Python int: cell (i, j) is bit i * width + j.
+Neighbor queries are done for every cell at once by shifting the board
+one row up/down or one column left/right and masking off the bits that
+would wrap around a row edge.
+"""
+import random
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(x):
+        return bin(x).count("1")
+
+
+class BitGeometry:
+    """Shift masks and per-cell neighbor tables for a width x height board."""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.full = (1 << self.size) - 1
+        first_col = sum(1 << (i * width) for i in range(height))
+        self.not_first_col = self.full & ~first_col
+        self.not_last_col = self.full & ~(first_col << (width - 1))
+        # Neighbor order matches neighbors(): up, down, left, right.
+        self.neighbor_cells = []
+        for k in range(self.size):
+            i, j = divmod(k, width)
+            cells = []
+            for ni, nj in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)):
+                if 0 <= ni < height and 0 <= nj < width:
+                    cells.append(ni * width + nj)
+            self.neighbor_cells.append(tuple(cells))
+        self.neighbor_bits = [sum(1 << n for n in cells) for cells in self.neighbor_cells]
+
+    def shifted(self, x):
+        """
+        The four neighbor planes of x: bit k of each plane is set when the
+        cell above, below, left of or right of k (respectively) is set in x.
+        """
+        w = self.width
+        return ((x << w) & self.full,
+                x >> w,
+                (x << 1) & self.not_first_col,
+                (x >> 1) & self.not_last_col)
+
+    def any_neighbor(self, x):
+        up, down, left, right = self.shifted(x)
+        return up | down | left | right
+
+    def neighbor_counts(self, x):
+        """
+        Return [E0, E1, E2, E3, E4] where Ec has bit k set when exactly c of
+        the four neighbors of k are set in x.
+        """
+        exact = [self.full, 0, 0, 0, 0]
+        for plane, m in enumerate(self.shifted(x), 1):
+            for c in range(plane, 0, -1):
+                exact[c] = (exact[c] & ~m) | (exact[c - 1] & m)
+            exact[0] &= ~m
+        return exact
+
+    def from_grid(self, grid):
+        bits = 0
+        for i in range(self.height):
+            row = grid[i]
+            for j in range(self.width):
+                if row[j]:
+                    bits |= 1 << (i * self.width + j)
+        return bits
+
+    def to_grid(self, x):
+        return [[bool(x >> (i * self.width + j) & 1) for j in range(self.width)]
+                for i in range(self.height)]
+
+    def from_cells(self, cells):
+        bits = 0
+        for i, j in cells:
+            bits |= 1 << (i * self.width + j)
+        return bits
+
+    def to_cell(self, k):
+        return divmod(k, self.width)
+
+
+def set_board_size(module, width, height):
+    """
+    Make a solver module's board width x height (the game's is 21 x 12): its
+    WIDTH, HEIGHT and BITS change and its active_mask becomes all active.
+    Anything built for the old size (compiled boards, snakes, states) must
+    be rebuilt.
+    """
+    if width < 2 or height < 2:
+        raise ValueError("the board must be at least 2 x 2")
+    if (width, height) != (module.WIDTH, module.HEIGHT):
+        module.WIDTH, module.HEIGHT = width, height
+        module.BITS = BitGeometry(width, height)
+    module.active_mask = [[True] * width for _ in range(height)]
+
+
+def random_bit(x):
+    """Index of a uniformly chosen set bit of x (x must be non-zero)."""
+    for _ in range(random.randrange(popcount(x))):
+        x &= x - 1
+    return (x & -x).bit_length() - 1
+
+
+def bit_indices(x):
+    """Indices of the set bits of x, lowest first."""
+    out = []
+    while x:
+        low = x & -x
+        out.append(low.bit_length() - 1)
+        x ^= low
+    return out
+
+
+def compile_neighbors(geometry, active):
+    """
+    Compile an active mask into a flat neighbor table: entry k lists the
+    active neighbors n of cell k (in neighbors() order) as (n, neighbor_bits[n])
+    pairs, so regrowth never rechecks bounds or the mask.
+    """
+    return [tuple((n, geometry.neighbor_bits[n]) for n in geometry.neighbor_cells[k]
+                  if active >> n & 1)
+            for k in range(geometry.size)]
+
+
+def regrow_bits(table, snake, snake_bits, trunc_index, max_steps=None, lookahead=False):
+    """
+    Bitboard counterpart of random_regrow: snake is a tuple of flat cell
+    indices, snake_bits its bitboard and table comes from compile_neighbors.
+    The snake is truncated after trunc_index and regrown randomly without
+    touching itself. With lookahead, cells that would leave the head with no
+    further move are only taken when nothing else is available. max_steps
+    caps the regrowth (by default the number of cells).
+    Returns (new_snake, new_snake_bits).
+    """
+    new_snake = list(snake[:trunc_index + 1])
+    for k in snake[trunc_index + 1:]:
+        snake_bits &= ~(1 << k)
+    head = new_snake[-1]
+    steps = 0
+    if max_steps is None:
+        max_steps = len(table)
+    while steps < max_steps:
+        head_bit = 1 << head
+        candidates = []
+        for n, nbits in table[head]:
+            # The only snake cell allowed next to the new cell is the head.
+            if snake_bits & nbits == head_bit and not snake_bits >> n & 1:
+                candidates.append(n)
+        if not candidates:
+            break
+        if lookahead and len(candidates) > 1:
+            # A cell m is a legal move after n when it touches no snake cell yet.
+            open_ended = [n for n in candidates
+                          if any(not snake_bits & mbits and not snake_bits >> m & 1
+                                 for m, mbits in table[n])]
+            if open_ended:
+                candidates = open_ended
+        head = random.choice(candidates)
+        new_snake.append(head)
+        snake_bits |= 1 << head
+        steps += 1
+    return tuple(new_snake), snake_bits
@@ -0,0 +1,58 @@
+"""
+Fixtures shared by the test modules: every test starts on (and leaves
+behind) the game's 21 x 12 board, and may build random boards and walks.
+"""
+import random
+
+import pytest
+
+import FullForceVersion as F
+import riverThicket as R
+
+
+@pytest.fixture(autouse=True)
+def game_board():
+    """Each test may resize and mask the board; put the game's back afterwards."""
+    F.set_board_size(21, 12)
+    F.MAX_OASIS = 50
+    yield
+    F.set_board_size(21, 12)
+    F.MAX_OASIS = 50
+    R.set_board_size(21, 12)
+
+
+def _random_board(width, height, seed, blocked=0.15, max_oasis=7):
+    """A width x height board with about blocked of its inner cells inactive."""
+    rng = random.Random(seed)
+    F.set_board_size(width, height)
+    F.active_mask = [[rng.random() > blocked or j in (0, width - 1) for j in range(width)]
+                     for _ in range(height)]
+    F.MAX_OASIS = max_oasis
+    return F.Board()
+
+
+def _random_snapshots(board, steps=3000, every=50, seed=0):
+    """Bit states (and their scores) visited by a walk of random moves, all accepted."""
+    random.seed(seed)
+    snake = F.random_regrow([F.choose_start()], 0, board)
+    state = F.State((snake, F.init_dessert_mask(), F.init_suburb_mask()), board)
+    snapshots = []
+    for step in range(steps):
+        F.random_move(state, True, F.SNAKE_WEIGHTS)
+        state.score()
+        state.commit()
+        if step % every == 0:
+            snapshots.append((state.snapshot(), state.score()))
+    return snapshots
+
+
+@pytest.fixture
+def random_board():
+    """random_board(width, height, seed, blocked=0.15, max_oasis=7) -> Board."""
+    return _random_board
+
+
+@pytest.fixture
+def random_snapshots():
+    """random_snapshots(board, steps=3000, every=50, seed=0) -> [(bit state, score)]."""
+    return _random_snapshots
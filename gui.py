@@ -0,0 +1,200 @@
+"""
+Tkinter windows used by riverThicket.py and FullForceVersion.py.
+They live here so the solver modules import without tkinter (e.g. for
+batch.py on headless servers); the mains import this module lazily.
+"""
+import queue, threading, time
+import tkinter as tk
+from tkinter import messagebox
+
+# Softer colors for the final layout.
+TILE_COLORS = {
+    'T': "PaleGreen",
+    'M': "LightGreen",
+    'R': "SkyBlue",
+    'O': "MediumTurquoise",
+    'D': "LightSalmon",
+    'S': "Khaki",
+    'I': "LightGray",
+}
+
+# UI for Selecting Active Cells (and optionally the Oasis Value)
+class CellSelector(tk.Tk):
+    """
+    Grid of buttons that toggles entries of mask in place (True = active).
+    With ask_max_oasis, an entry for the maximum oasis count is shown and
+    the validated value ends up in self.max_oasis.
+    """
+    def __init__(self, mask, ask_max_oasis=False):
+        super().__init__()
+        self.title("Select Active Cells")
+        self.mask = mask
+        self.height = len(mask)
+        self.width = len(mask[0])
+        self.ask_max_oasis = ask_max_oasis
+        self.max_oasis = None
+        self.buttons = {}
+        for i in range(self.height):
+            for j in range(self.width):
+                btn = tk.Button(self, width=2, height=1,
+                                command=lambda i=i, j=j: self.toggle_cell(i, j))
+                btn.grid(row=i, column=j, padx=1, pady=1)
+                self.buttons[(i, j)] = btn
+                btn.config(bg="white" if mask[i][j] else "gray")
+
+        start_row = self.height
+        if ask_max_oasis:
+            # Add a label and entry for maximum oasis
+            self.max_oasis_label = tk.Label(self, text="Max Oasis:", justify="right")
+            self.max_oasis_label.grid(row=self.height, column=0, columnspan=3, sticky="ne",
+                                      padx=5, pady=5)
+
+            self.max_oasis_entry = tk.Entry(self, width=2)
+            self.max_oasis_entry.grid(row=self.height, column=3, columnspan=1, sticky="nw",
+                                      padx=5, pady=5)
+            self.max_oasis_entry.insert(0, "50")  # default value
+            start_row += 1
+
+        self.start_button = tk.Button(self, text="Start Optimization", command=self.on_start)
+        self.start_button.grid(row=start_row, column=0, columnspan=self.width, sticky="we",
+                               padx=5 if ask_max_oasis else 0, pady=5 if ask_max_oasis else 0)
+        self.selected = False
+
+    def toggle_cell(self, i, j):
+        self.mask[i][j] = not self.mask[i][j]
+        btn = self.buttons[(i, j)]
+        btn.config(bg="white" if self.mask[i][j] else "gray")
+
+    def on_start(self):
+        if self.ask_max_oasis:
+            try:
+                max_oasis = int(self.max_oasis_entry.get())
+                if max_oasis < 0:
+                    raise ValueError()
+                if max_oasis > 50:
+                    max_oasis = 50
+            except ValueError:
+                messagebox.showerror("Error", "Invalid maximum oasis value!")
+                return
+            self.max_oasis = max_oasis
+
+        # Make sure at least one cell is active.
+        if not any(any(row) for row in self.mask):
+            messagebox.showerror("Error", "No active cells selected!")
+            return
+        self.selected = True
+        self.destroy()
+
+def run_selection(mask, ask_max_oasis=False):
+    """Show the selector until Start is pressed; returns the closed CellSelector."""
+    app = CellSelector(mask, ask_max_oasis)
+    app.mainloop()
+    return app
+
+def show_error(message):
+    messagebox.showerror("Error", message)
+
+# Live Results
+class LiveLayout(tk.Tk):
+    """
+    Results window repainted while a solver runs on a worker thread: the
+    best layout so far, lines of stats and the elapsed time, with a button
+    that stops the solver and keeps its best layout.
+    """
+    def __init__(self, height, width, title="Best Layout So Far", show_text=True):
+        super().__init__()
+        self.title(title)
+        self.show_text = show_text
+        self.stop = threading.Event()
+        self.started = time.time()
+        self.cells = {}
+        self.tiles = {}
+        for i in range(height):
+            for j in range(width):
+                label = tk.Label(self, text="", width=2, height=1, bg=TILE_COLORS['I'],
+                                 relief="flat", borderwidth=1)
+                label.grid(row=i, column=j, padx=1, pady=1)
+                self.cells[(i, j)] = label
+        self.stats_label = tk.Label(self, text="Starting...", justify="left", anchor="w")
+        self.stats_label.grid(row=height, column=0, columnspan=width, sticky="we", padx=5)
+        self.status_label = tk.Label(self, text="", anchor="w")
+        self.status_label.grid(row=height + 1, column=0, columnspan=width, sticky="we", padx=5)
+        self.stop_button = tk.Button(self, text="Stop and keep best", command=self.on_stop)
+        self.stop_button.grid(row=height + 2, column=0, columnspan=width, sticky="we",
+                              padx=5, pady=5)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def show(self, layout, lines):
+        """Repaint the cells that changed and replace the stats text."""
+        for i, row in enumerate(layout):
+            for j, cell in enumerate(row):
+                if self.tiles.get((i, j)) != cell:
+                    self.tiles[(i, j)] = cell
+                    self.cells[(i, j)].config(text=cell if self.show_text else "",
+                                              bg=TILE_COLORS.get(cell, "LightGray"))
+        self.stats_label.config(text="\n".join(lines))
+
+    def set_status(self, text):
+        self.status_label.config(text=text)
+
+    def on_stop(self):
+        self.stop.set()
+        self.stop_button.config(text="Stopping...", state="disabled")
+
+    def on_close(self):
+        self.stop.set()
+        self.destroy()
+
+    def finish(self, text):
+        self.set_status(text)
+        self.stop_button.config(text="Close", state="normal", command=self.destroy)
+
+def run_live(solve, describe, height, width, title="Best Layout So Far", show_text=True,
+             poll_ms=100):
+    """
+    Run solve(stop, publish) on a worker thread while a LiveLayout shows its
+    progress. solve must return when the threading.Event stop is set and may
+    call publish(result) with each new best; results (and its return value)
+    are dicts with the layout as one string per row, and describe(result)
+    gives the lines of stats to show. The window is polled every poll_ms, so
+    the UI never waits on the solver. Returns solve's result, or None if it
+    raised (the error is shown in the window).
+    """
+    window = LiveLayout(height, width, title, show_text)
+    messages = queue.Queue()
+    outcome = {}
+
+    def worker():
+        try:
+            outcome["result"] = solve(window.stop, lambda result: messages.put(("best", result)))
+            messages.put(("done", outcome["result"]))
+        except Exception as error:
+            messages.put(("error", error))
+
+    def poll():
+        latest = None
+        while True:
+            try:
+                kind, payload = messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "error":
+                window.finish(f"Error: {payload}")
+                return
+            latest = payload
+            if kind == "done":
+                window.show(latest["layout"], describe(latest))
+                window.finish("Stopped, best layout kept." if window.stop.is_set() else "Done.")
+                return
+        if latest is not None:
+            window.show(latest["layout"], describe(latest))
+        window.set_status(f"Running for {time.time() - window.started:.0f} s")
+        window.after(poll_ms, poll)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    window.after(poll_ms, poll)
+    window.mainloop()
+    # Closing the window stops the solver too; wait for its best result.
+    thread.join()
+    return outcome.get("result")
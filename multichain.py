@@ -0,0 +1,271 @@
+"""
+Many independent FullForceVersion annealing chains advanced in lockstep
+with NumPy (an optional dependency, only this engine needs it).
+
+The K chains' snake, dessert and suburb flags are stacked boolean arrays of
+shape (K, HEIGHT, WIDTH). Every step proposes one move per chain with the
+same mix as random_move: dessert toggles and suburb additions are drawn
+for all their chains at once, while snake regrowth (a walk, not an array
+operation) stays per chain on bit states with regrow_bits. All K proposals
+are then classified and scored together with shifted-array neighbor counts
+(river and suburb neighbors, dessert adjacency for Maquis), compiled from
+the same RULE_TABLE as the other scorers, and accepted or rejected with one
+vectorized Metropolis test at the schedule's temperature.
+"""
+import math, random, time
+
+try:
+    import numpy as np
+except ImportError:  # Only this engine needs NumPy.
+    np = None
+
+import FullForceVersion as F
+from bitboard import regrow_bits
+from schedules import LinearSchedule
+
+
+def _planes(x):
+    """The four neighbor planes of stacked boards x: above, below, left and right of each cell."""
+    up = np.zeros_like(x)
+    down = np.zeros_like(x)
+    left = np.zeros_like(x)
+    right = np.zeros_like(x)
+    up[:, 1:, :] = x[:, :-1, :]
+    down[:, :-1, :] = x[:, 1:, :]
+    left[:, :, 1:] = x[:, :, :-1]
+    right[:, :, :-1] = x[:, :, 1:]
+    return up, down, left, right
+
+
+def any_neighbor(x):
+    up, down, left, right = _planes(x)
+    return up | down | left | right
+
+
+def neighbor_counts(x):
+    up, down, left, right = _planes(x.astype(np.int8))
+    return up + down + left + right
+
+
+def compile_values():
+    """
+    RULE_TABLE as arrays: values[t, rivers * 5 + suburbs] is what tile t adds
+    to channel channels[t] (0 for tiles that don't score).
+    """
+    values = np.zeros((len(F.TILE_CHARS), 25), dtype=np.int64)
+    channels = np.zeros(len(F.TILE_CHARS), dtype=np.int64)
+    for t, rule in enumerate(F.RULE_TABLE):
+        if rule is not None:
+            channels[t] = rule[0]
+            values[t] = rule[1]
+    return values, channels
+
+
+def classify(active, snake, dessert, suburb):
+    """classify_bits for stacked boards: the tile code of every cell of every chain."""
+    free = active & ~snake
+    oasis = snake & any_neighbor(dessert & free)
+    desserts = free & ~suburb & dessert & any_neighbor(snake)
+    rest = free & ~suburb & ~desserts
+    maquis = rest & any_neighbor(desserts)
+    tiles = np.full(snake.shape, F.TILE_I, dtype=np.int8)
+    tiles[rest] = F.TILE_T
+    tiles[maquis] = F.TILE_M
+    tiles[snake] = F.TILE_R
+    tiles[oasis] = F.TILE_O
+    tiles[desserts] = F.TILE_D
+    tiles[free & suburb] = F.TILE_S
+    return tiles
+
+
+def channel_totals(tiles, values, channels):
+    """The (K, channels) totals of stacked tile codes."""
+    lookup = (neighbor_counts(tiles == F.TILE_R).astype(np.int64) * 5
+              + neighbor_counts(tiles == F.TILE_S))
+    cell_values = values[tiles, lookup]
+    cell_channels = channels[tiles]
+    totals = np.zeros((tiles.shape[0], len(F.SCORING_RULES)), dtype=np.int64)
+    for channel in range(len(F.SCORING_RULES)):
+        totals[:, channel] = np.where(cell_channels == channel, cell_values, 0).sum(axis=(1, 2))
+    return totals
+
+
+def channel_scores(totals):
+    """channel_score for every row of channel totals."""
+    return (totals[:, F.THICKET_CHANNEL] - totals[:, F.MAQUIS_CHANNEL] // 2
+            + 30 * np.minimum(totals[:, F.OASIS_CHANNEL], F.MAX_OASIS)
+            + 10 * np.minimum(totals[:, F.SUBURB_CHANNEL], 25))
+
+
+def bits_to_plane(x):
+    """A bitboard as a (HEIGHT, WIDTH) boolean array."""
+    size = F.WIDTH * F.HEIGHT
+    raw = np.frombuffer(x.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder="little")[:size].reshape(F.HEIGHT, F.WIDTH).astype(bool)
+
+
+def plane_to_bits(plane):
+    return int.from_bytes(np.packbits(plane.ravel(), bitorder="little").tobytes(), "little")
+
+
+def _choose(rng, candidates):
+    """
+    One uniformly random candidate cell per board of stacked boolean
+    candidates, as flat indices, and which boards had any.
+    """
+    keys = rng.random(candidates.shape)
+    keys[~candidates] = -1.0
+    flat = keys.reshape(len(keys), -1)
+    return flat.argmax(axis=1), candidates.any(axis=(1, 2))
+
+
+def _toggle_desserts(rng, active, snake, dessert, rows):
+    """dessert_move for the chains in rows, in place."""
+    if not len(rows):
+        return
+    candidates = active & ~snake[rows] & any_neighbor(snake[rows])
+    cells, found = _choose(rng, candidates)
+    rows, cells = rows[found], cells[found]
+    flat = dessert.reshape(len(dessert), -1)
+    flat[rows, cells] = ~flat[rows, cells]
+
+
+def _add_suburbs(rng, active, snake, suburb, rows):
+    """suburb_move for the chains in rows, in place."""
+    if not len(rows):
+        return
+    suburbs = suburb[rows]
+    candidates = active & ~snake[rows] & ~suburbs
+    count = suburbs.sum(axis=(1, 2))
+    # The first suburb may go anywhere; later ones must touch one.
+    candidates &= any_neighbor(suburbs) | (count == 0)[:, None, None]
+    # An addition is only valid if it leaves no suburb without a suburb
+    # neighbor, i.e. if it touches every isolated suburb.
+    isolated = suburbs & ~any_neighbor(suburbs)
+    lonely = isolated.sum(axis=(1, 2))
+    valid = ((count <= 1) | (lonely == 0))[:, None, None]
+    candidates &= valid | (neighbor_counts(isolated) == lonely[:, None, None])
+    cells, found = _choose(rng, candidates)
+    rows, cells = rows[found], cells[found]
+    suburb.reshape(len(suburb), -1)[rows, cells] = True
+
+
+def multichain_annealing(initial_state, chains=256, time_limit=300, board=None,
+                         lookahead=False, verbose=True, T0=100.0, total_iterations=20000,
+                         progress=None, stop=None, publish=None, archive=None,
+                         polish_best=True):
+    """
+    Anneal chains copies of initial_state at once (see the module docstring);
+    initial_state may also be a list of states, given to the chains in turn.
+    Every chain follows the same linear ramp from T0 over total_iterations
+    steps (recalibrated to the time_limit, as in simulated_annealing); a step
+    advances every chain by one proposal. board, lookahead, verbose, stop
+    and publish are as for simulated_annealing; progress is called as
+    progress(iteration, elapsed, best_score) with iteration counting the
+    proposals of all chains. archive, a pareto.ParetoArchive, is offered the
+    states every chain accepts. polish_best is as for simulated_annealing.
+    Returns (best_state, best_score) over all chains.
+    """
+    if np is None:
+        raise ImportError("multichain_annealing needs NumPy (pip install numpy)")
+    if board is None:
+        board = F.Board()
+    rng = np.random.default_rng(random.getrandbits(64))
+    values, channels = compile_values()
+    active = bits_to_plane(board.active_bits)
+    if not isinstance(initial_state, list):
+        initial_state = [initial_state]
+    starts = [F.state_to_bits(state) for state in initial_state]
+    starts = [starts[c % len(starts)] for c in range(chains)]
+    snakes = [start[0] for start in starts]
+    snake_masks = [start[1] for start in starts]
+    snake = np.stack([bits_to_plane(start[1]) for start in starts])
+    dessert = np.stack([bits_to_plane(start[2]) for start in starts])
+    suburb = np.stack([bits_to_plane(start[3]) for start in starts])
+
+    def scores(snake, dessert, suburb):
+        totals = channel_totals(classify(active, snake, dessert, suburb), values, channels)
+        return channel_scores(totals), totals
+
+    current, _ = scores(snake, dessert, suburb)
+    leader = int(current.argmax())
+    best = int(current[leader])
+    best_state = starts[leader]
+    if publish is not None:
+        publish(F.bits_to_state(best_state), best)
+    if archive is not None:
+        archive.offer(F.stat_objectives(F.channel_totals_bits(
+            F.classify_bits(best_state, board.active_bits))), best, best_state)
+    schedule = LinearSchedule(T0, 0.1, total_iterations,
+                              time_limit=time_limit if math.isfinite(time_limit) else None)
+    start_time = time.time()
+    step = 0
+    while time.time() - start_time < time_limit:
+        if stop is not None and stop.is_set():
+            if verbose:
+                print("Stopped. Keeping the best state.")
+            break
+        step += 1
+        T = schedule.temperature(step)
+        if T is None:
+            if verbose:
+                print("Temperature threshold reached. Stopping optimization.")
+            break
+
+        # The same 60/25/15 snake/dessert/suburb mix as random_move.
+        kinds = rng.random(chains)
+        new_snake, new_dessert, new_suburb = snake.copy(), dessert.copy(), suburb.copy()
+        _toggle_desserts(rng, active, snake, new_dessert,
+                         np.flatnonzero((kinds >= 0.6) & (kinds < 0.85)))
+        _add_suburbs(rng, active, snake, new_suburb, np.flatnonzero(kinds >= 0.85))
+        regrown = {}
+        for c in np.flatnonzero(kinds < 0.6).tolist():
+            cells = snakes[c]
+            if len(cells) <= 1:
+                continue
+            trunc_index = random.randint(0, len(cells) - 1)
+            regrown[c] = regrow_bits(board.table, cells, snake_masks[c], trunc_index,
+                                     lookahead=lookahead)
+            new_snake[c] = bits_to_plane(regrown[c][1])
+        if regrown:
+            # Cells joining the snake lose their dessert flag.
+            new_dessert &= ~new_snake
+
+        new_scores, totals = scores(new_snake, new_dessert, new_suburb)
+        delta = new_scores - current
+        accept = delta >= 0
+        accept |= rng.random(chains) < np.exp(np.minimum(delta, 0) / T)
+        where = accept[:, None, None]
+        np.copyto(snake, new_snake, where=where)
+        np.copyto(dessert, new_dessert, where=where)
+        np.copyto(suburb, new_suburb, where=where)
+        current = np.where(accept, new_scores, current)
+        for c, (cells, bits) in regrown.items():
+            if accept[c]:
+                snakes[c], snake_masks[c] = cells, bits
+        if archive is not None:
+            for c in np.flatnonzero(accept).tolist():
+                archive.offer(F.stat_objectives(totals[c].tolist()), int(current[c]),
+                              (snakes[c], snake_masks[c], plane_to_bits(dessert[c]),
+                               plane_to_bits(suburb[c])))
+
+        leader = int(current.argmax())
+        if current[leader] > best:
+            best = int(current[leader])
+            best_state = (snakes[leader], snake_masks[leader],
+                          plane_to_bits(dessert[leader]), plane_to_bits(suburb[leader]))
+            if progress is not None:
+                progress(step * chains, time.time() - start_time, best)
+            if publish is not None:
+                publish(F.bits_to_state(best_state), best)
+
+        if verbose and step % 100 == 0:
+            print(f"Step {step:6d} | Mean Score: {current.mean():8.2f} | "
+                  f"Best Score: {best:8.2f} | Temperature: {T:6.2f}")
+    if polish_best:
+        best_state, best, made = F.polish_snapshot(best_state, best, board, publish, archive)
+        if verbose:
+            print(f"Polishing made {made} moves. Best Score: {best:8.2f}")
+    if progress is not None:
+        progress(step * chains, time.time() - start_time, best)
+    return F.bits_to_state(best_state), best
@@ -0,0 +1,93 @@
+"""
+Bounded archive of non-dominated solutions, for keeping every trade-off
+between several objectives that one annealing run comes across.
+
+An objective vector is a tuple in which larger is better in every position;
+a vector dominates another if it is at least as large everywhere and larger
+somewhere. ParetoArchive keeps its vectors sorted, so a new vector is only
+compared with the entries that could dominate it (no smaller in the first
+objective) or that it could dominate (no larger in the first objective).
+When full, it drops the most crowded entry (smallest NSGA-II crowding
+distance), which never removes the extreme of an objective, nor the
+best-scoring entry.
+"""
+import bisect, math
+
+
+def dominates(a, b):
+    """Whether objective vector a dominates b."""
+    return a != b and all(x >= y for x, y in zip(a, b))
+
+
+class ParetoArchive:
+    """
+    At most size mutually non-dominated (objectives, score, state) entries.
+    Of several entries with the same objectives only the best-scoring one is
+    kept. Archives pickle, so they can ride along in checkpoints.
+    """
+    def __init__(self, size=50):
+        self.size = size
+        # Sorted objective vectors and, at the same positions, their (score, state).
+        self.vectors = []
+        self.entries = []
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def offer(self, objectives, score, state):
+        """Add an entry unless it is dominated, dropping the entries it dominates. Returns whether it was added."""
+        vectors, entries = self.vectors, self.entries
+        first = objectives[0]
+        lo = bisect.bisect_left(vectors, (first,))
+        for i in range(lo, len(vectors)):
+            vector = vectors[i]
+            if vector == objectives:
+                if score <= entries[i][0]:
+                    return False
+                entries[i] = (score, state)
+                return True
+            if all(x >= y for x, y in zip(vector, objectives)):
+                return False
+        hi = lo
+        while hi < len(vectors) and vectors[hi][0] == first:
+            hi += 1
+        for i in reversed(range(hi)):
+            if all(x >= y for x, y in zip(objectives, vectors[i])):
+                del vectors[i], entries[i]
+        i = bisect.bisect_left(vectors, objectives)
+        vectors.insert(i, objectives)
+        entries.insert(i, (score, state))
+        if len(vectors) > self.size:
+            crowding = self.crowding()
+            best = max(range(len(entries)), key=lambda j: entries[j][0])
+            crowding[best] = math.inf
+            worst = min(range(len(vectors)), key=crowding.__getitem__)
+            del vectors[worst], entries[worst]
+            return worst != i
+        return True
+
+    def merge(self, other):
+        """Offer every entry of another archive."""
+        for objectives, score, state in other.front():
+            self.offer(objectives, score, state)
+
+    def crowding(self):
+        """NSGA-II crowding distance of each entry (infinite at the extremes)."""
+        vectors = self.vectors
+        distance = [0.0] * len(vectors)
+        for m in range(len(vectors[0]) if vectors else 0):
+            order = sorted(range(len(vectors)), key=lambda i: vectors[i][m])
+            low, high = vectors[order[0]][m], vectors[order[-1]][m]
+            distance[order[0]] = distance[order[-1]] = math.inf
+            if high == low:
+                continue
+            for a, i, b in zip(order, order[1:], order[2:]):
+                distance[i] += (vectors[b][m] - vectors[a][m]) / (high - low)
+        return distance
+
+    def front(self):
+        """The entries as (objectives, score, state), best score first."""
+        front = [(vector, score, state)
+                 for vector, (score, state) in zip(self.vectors, self.entries)]
+        front.sort(key=lambda entry: entry[1], reverse=True)
+        return front
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
-import random, math, time, tkinter as tk
-from tkinter import messagebox
+import random, math, time, sys
+from array import array
+from schedules import LinearSchedule, ReactiveSchedule, ElitePool, RESTART, STOP
+from bitboard import (BitGeometry, popcount, compile_neighbors, regrow_bits,
+                      set_board_size as resize_module)
 
 # Grid dimensions
 WIDTH = 21
@@ -11,49 +14,15 @@ HEIGHT = 12
 #   False means the cell is unavailable (user–selected).
 active_mask = [[True for _ in range(WIDTH)] for _ in range(HEIGHT)]
 
+# Shift masks for the bitboard backend.
+BITS = BitGeometry(WIDTH, HEIGHT)
 
-####################################
-# UI for Selecting Active Cells
-####################################
-class CellSelector(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title("Select Active Cells")
-        self.buttons = {}
-        # Create a grid of buttons
-        for i in range(HEIGHT):
-            for j in range(WIDTH):
-                btn = tk.Button(self, width=2, height=1,
-                                command=lambda i=i, j=j: self.toggle_cell(i, j))
-                btn.grid(row=i, column=j, padx=1, pady=1)
-                self.buttons[(i, j)] = btn
-                btn.config(bg="white")
-        # Add a Start button below the grid
-        self.start_button = tk.Button(self, text="Start Optimization", command=self.on_start)
-        self.start_button.grid(row=HEIGHT, column=0, columnspan=WIDTH, sticky="we")
-        self.selected = False
-
-    def toggle_cell(self, i, j):
-        global active_mask
-        # Toggle the state
-        active_mask[i][j] = not active_mask[i][j]
-        btn = self.buttons[(i, j)]
-        if active_mask[i][j]:
-            btn.config(bg="white")
-        else:
-            btn.config(bg="gray")
-
-    def on_start(self):
-        # Make sure at least one cell is active.
-        if not any(active_mask[i][j] for i in range(HEIGHT) for j in range(WIDTH)):
-            messagebox.showerror("Error", "No active cells selected!")
-            return
-        self.selected = True
-        self.destroy()
-
-def run_selection():
-    app = CellSelector()
-    app.mainloop()
+def set_board_size(width, height):
+    """
+    Make the board width x height (see bitboard.set_board_size). solve()
+    calls this with the size of its mask.
+    """
+    resize_module(sys.modules[__name__], width, height)
 
 
 ####################################
@@ -101,6 +70,17 @@ def cell_score(i, j, layout):
 def total_score(layout):
     return sum(cell_score(i, j, layout) for i in range(HEIGHT) for j in range(WIDTH))
 
+def total_score_bits(snake_bits, active):
+    """
+    Bitboard counterpart of total_score(snake_to_layout(snake)): every
+    active non-river cell is a thicket worth 2 * 2^(# adjacent river cells).
+    """
+    thickets = active & ~snake_bits
+    score = 0
+    for r, exact in enumerate(BITS.neighbor_counts(snake_bits & active)):
+        score += popcount(thickets & exact) << (r + 1)
+    return score
+
 def snake_to_layout(snake):
     """
     Given a snake (list of (i,j) cells), mark those active cells as river ('R')
@@ -112,193 +92,498 @@ def snake_to_layout(snake):
             layout[i][j] = 'R'
     return layout
 
-def is_extension_candidate(pos, head, snake_set):
+def compile_board():
     """
-    For candidate cell pos (i,j) to be an extension of the snake:
-      - It must be active.
-      - It must not already be in the snake.
-      - It must be adjacent to the current head.
-      - It must not touch any other snake cell (to avoid self-intersection).
+    Compile the active mask into a flat neighbor table (see compile_neighbors):
+    entry i * WIDTH + j lists the active neighbors of (i, j). Build it once
+    after the selection window closes.
     """
-    i, j = pos
-    if pos in snake_set:
-        return False
-    if not active_mask[i][j]:
-        return False
-    hi, hj = head
-    if abs(i - hi) + abs(j - hj) != 1:
-        return False
-    for ni, nj in neighbors(i, j):
-        if (ni, nj) in snake_set and (ni, nj) != head:
-            return False
-    return True
-
-def random_regrow(snake, trunc_index):
+    return compile_neighbors(BITS, BITS.from_grid(active_mask))
+
+def random_regrow(snake, trunc_index, table=None, lookahead=False):
     """
     Truncate the snake at trunc_index and regrow it randomly (if possible)
-    while obeying the non–self–intersection rule.
+    while obeying the non–self–intersection rule:
+      - Each new cell is an active neighbor of the head, not already in the snake.
+      - It must not touch any other snake cell (to avoid self-intersection).
+    With lookahead, cells that leave no further move are avoided while others exist.
     """
-    new_snake = snake[:trunc_index+1]
-    snake_set = set(new_snake)
-    head = new_snake[-1]
-    max_steps = 200  # safeguard
-    steps = 0
-    while steps < max_steps:
-        candidates = []
-        for ni, nj in neighbors(*head):
-            pos = (ni, nj)
-            if is_extension_candidate(pos, head, snake_set):
-                candidates.append(pos)
-        if not candidates:
-            break  # no legal extension available
-        next_cell = random.choice(candidates)
-        new_snake.append(next_cell)
-        snake_set.add(next_cell)
-        head = next_cell
-        steps += 1
-    return new_snake
-
-def simulated_annealing(initial_snake, time_limit=120):
+    if table is None:
+        table = compile_board()
+    flat = tuple(i * WIDTH + j for i, j in snake)
+    new_snake, _ = regrow_bits(table, flat, BITS.from_cells(snake), trunc_index,
+                               lookahead=lookahead)
+    return [BITS.to_cell(k) for k in new_snake]
+
+def simulated_annealing(initial_snake, time_limit=120, backend="bitboard", table=None,
+                        lookahead=False, verbose=True, progress=None, telemetry=None,
+                        schedule=None, stop=None, publish=None):
     """
     Use simulated annealing to search for a better snake layout.
     Moves consist of randomly truncating the snake and regrowing it.
     We now exit early if the temperature falls below 1.0.
+    backend is "bitboard" (snake kept as a tuple of flat indices plus a bit
+    mask and scored with shift-and-mask) or "layout" (rebuild and rescan the
+    layout grid each iteration).
+    table is the compiled neighbor table (see compile_board); lookahead makes
+    regrowth avoid walking into dead ends. verbose=False silences progress lines.
+    progress, if given, is called as progress(iteration, elapsed, best_score)
+    whenever the best score improves and once when the run stops.
+    telemetry, a telemetry.Telemetry, collects proposal counters (all under
+    the "snake" move) and the time spent regrowing, rebuilding the layout and scoring.
+    schedule replaces the default ramp (see schedules.py); a ReactiveSchedule
+    may reheat, restart from one of the best snakes found or stop early.
+    stop, a threading.Event, ends the run early (keeping the best snake) once
+    set; publish, if given, is called as publish(best_snake, best_score) at the
+    start and whenever the best improves.
     """
-    current_snake = initial_snake
-    current_layout = snake_to_layout(current_snake)
-    current_score = total_score(current_layout)
+    if table is None:
+        table = compile_board()
+    bitboard = backend == "bitboard"
+    if bitboard:
+        active = BITS.from_grid(active_mask)
+        current_snake = tuple(i * WIDTH + j for i, j in initial_snake)
+        current_bits = BITS.from_cells(initial_snake)
+        current_score = total_score_bits(current_bits, active)
+    else:
+        current_snake = initial_snake
+        current_layout = snake_to_layout(current_snake)
+        current_score = total_score(current_layout)
     best_snake = current_snake
     best_score = current_score
+    if schedule is None:
+        # 100000 nominal max iterations, stopping once the temperature reaches 1.0;
+        # a finite time_limit rescales the ramp to fit it.
+        schedule = LinearSchedule(100.0, 0.1, 100000, T_stop=1.0,
+                                  time_limit=time_limit if math.isfinite(time_limit) else None)
+    elites = ElitePool()
+    elites.offer(best_score, best_snake)
+    if publish is not None:
+        publish(initial_snake, best_score)
 
     start_time = time.time()
     iteration = 0
-    T0 = 100.0
-    T_end = 0.1
-    total_iterations = 100000  # nominal max iterations
+    if telemetry is not None:
+        clock = time.perf_counter
+        telemetry.start()
 
     while time.time() - start_time < time_limit:
         iteration += 1
-        frac = min(1.0, iteration / total_iterations)
-        T = T0 * (1 - frac) + T_end * frac
+        T = schedule.temperature(iteration)
 
-        # Terminate early if temperature falls to or below 1.0.
-        if T <= 1.0:
-            print("Temperature threshold reached. Stopping optimization.")
+        # Terminate early once the schedule runs out (by default at temperature 1.0).
+        if T is None:
+            if verbose:
+                print("Temperature threshold reached. Stopping optimization.")
             break
 
         if len(current_snake) <= 1:
             break
+        if stop is not None and stop.is_set():
+            if verbose:
+                print("Stopped. Keeping the best snake.")
+            break
 
+        if telemetry is not None:
+            t0 = clock()
         trunc_index = random.randint(0, len(current_snake) - 1)
-        candidate_snake = random_regrow(current_snake, trunc_index)
-        candidate_layout = snake_to_layout(candidate_snake)
-        candidate_score = total_score(candidate_layout)
+        if bitboard:
+            candidate_snake, candidate_bits = regrow_bits(table, current_snake, current_bits,
+                                                          trunc_index, lookahead=lookahead)
+        else:
+            candidate_snake = random_regrow(current_snake, trunc_index, table, lookahead)
+        if telemetry is not None:
+            t1 = clock()
+        if not bitboard:
+            candidate_layout = snake_to_layout(candidate_snake)
+        if telemetry is not None:
+            t2 = clock()
+        if bitboard:
+            candidate_score = total_score_bits(candidate_bits, active)
+        else:
+            candidate_score = total_score(candidate_layout)
+        if telemetry is not None:
+            t3 = clock()
+            telemetry.time["move"] += t1 - t0
+            telemetry.time["layout"] += t2 - t1
+            telemetry.time["score"] += t3 - t2
         delta = candidate_score - current_score
 
         # Accept improvements or sometimes worse moves.
-        if delta >= 0 or random.random() < math.exp(delta / T):
+        accepted = delta >= 0 or random.random() < math.exp(delta / T)
+        improved = accepted and candidate_score > best_score
+        if telemetry is not None:
+            telemetry.record("snake", candidate_snake != current_snake, accepted, improved)
+        if accepted:
             current_snake = candidate_snake
             current_score = candidate_score
-            if candidate_score > best_score:
+            if bitboard:
+                current_bits = candidate_bits
+            if improved:
                 best_snake = candidate_snake
                 best_score = candidate_score
-
-        if iteration % 1000 == 0:
+                elites.offer(best_score, best_snake)
+                if progress is not None:
+                    progress(iteration, time.time() - start_time, best_score)
+                if publish is not None:
+                    publish([BITS.to_cell(k) for k in best_snake] if bitboard else best_snake,
+                            best_score)
+
+        action = schedule.observe(iteration, improved)
+        if action is not None:
+            if verbose:
+                print(f"Iteration {iteration:6d} | Stagnated at {best_score:6d}: {action}")
+            if action == STOP:
+                break
+            if action == RESTART:
+                current_score, current_snake = elites.choice()
+                if bitboard:
+                    current_bits = 0
+                    for k in current_snake:
+                        current_bits |= 1 << k
+
+        if verbose and iteration % 1000 == 0:
             print(f"Iteration {iteration:6d} | Current score: {current_score:6d} | "
                   f"Best score: {best_score:6d} | Temperature: {T:6.2f}")
+    if telemetry is not None:
+        telemetry.stop()
+    if progress is not None:
+        progress(iteration, time.time() - start_time, best_score)
+    if bitboard:
+        best_snake = [BITS.to_cell(k) for k in best_snake]
     return best_snake, best_score
 
 
+def reactive_schedule(time_limit=None):
+    """The default ramp, reheating after 5000 iterations without a new best."""
+    return ReactiveSchedule(100.0, 0.1, 100000, T_stop=1.0, time_limit=time_limit,
+                            patience=5000)
+
+
+def choose_start():
+    """
+    Choose a starting border cell that is active: the first one found on
+    the top border, then the bottom, left and right borders.
+    """
+    # Try top border:
+    for j in range(WIDTH):
+        if active_mask[0][j]:
+            return (0, j)
+    # Try bottom border:
+    for j in range(WIDTH):
+        if active_mask[HEIGHT-1][j]:
+            return (HEIGHT-1, j)
+    # Try left border:
+    for i in range(HEIGHT):
+        if active_mask[i][0]:
+            return (i, 0)
+    # Try right border:
+    for i in range(HEIGHT):
+        if active_mask[i][WIDTH-1]:
+            return (i, WIDTH-1)
+    return None
+
+def solve(mask, time_limit=120, seed=None, exact=False, max_states=100000, verbose=False,
+          stop=None, publish=None, exact_time_limit=None):
+    """
+    Solve one board without any UI. mask is a grid of booleans (True = active)
+    of any size (see set_board_size) and becomes the module's active_mask.
+    Returns a dict with the layout (one string per row), score, stats and snake.
+    With exact, the annealed river then seeds frontier_dp; the result also
+    gets "anneal_score", "gap" (how far annealing fell short) and "certified"
+    (False when a cap was hit and the optimum is not proven). The search
+    gets exact_time_limit seconds (by default time_limit) before falling back
+    to the annealed river.
+    stop, a threading.Event, ends the annealing (and the search) early with
+    the best river so far; publish, if given, is called with a result dict
+    for the starting river and each better one found.
+    """
+    global active_mask
+    if not mask or any(len(row) != len(mask[0]) for row in mask):
+        raise ValueError("mask must be a non-empty grid with rows of equal length")
+    set_board_size(len(mask[0]), len(mask))
+    active_mask = [[bool(cell) for cell in row] for row in mask]
+    if seed is not None:
+        random.seed(seed)
+    start = choose_start()
+    if start is None:
+        raise ValueError("No active border cell available for starting the river!")
+    table = compile_board()
+    initial_snake = random_regrow([start], 0, table)
+    if verbose:
+        print("Initial snake length:", len(initial_snake),
+              "Score:", total_score(snake_to_layout(initial_snake)))
+    live = None
+    if publish is not None:
+        live = lambda snake, score: publish(_solve_result(snake, score))
+    best_snake, best_score = simulated_annealing(initial_snake, time_limit, table=table,
+                                                 lookahead=True, verbose=verbose,
+                                                 schedule=reactive_schedule(time_limit),
+                                                 stop=stop, publish=live)
+    extra = {}
+    if exact:
+        anneal_score = best_score
+        if exact_time_limit is None:
+            exact_time_limit = time_limit
+        best_snake, best_score, certified = frontier_dp(start, max_states, best_snake,
+                                                        verbose=False,
+                                                        time_limit=exact_time_limit, stop=stop)
+        extra = {"anneal_score": anneal_score, "gap": best_score - anneal_score,
+                 "certified": certified}
+    result = _solve_result(best_snake, best_score)
+    result.update(extra)
+    return result
+
+def _solve_result(snake, score):
+    layout = snake_to_layout(snake)
+    attackSpeed = sum(cell_score(i, j, layout) for i in range(HEIGHT) for j in range(WIDTH))
+    return {"score": score, "stats": {"attackSpeed": attackSpeed},
+            "layout": ["".join(row) for row in layout],
+            "snake": [list(cell) for cell in snake]}
+
+
 ####################################
-# Display Final Layout
+# Exact Solver (Frontier DP)
 ####################################
-def display_layout(layout):
+# Cells are decided one at a time in column-major order (down each column,
+# then on to the next), so the undecided part of the board is separated from
+# the decided part by a frontier of HEIGHT cells: rows above the current cell
+# in this column, rows from it down in the previous column.
+# Each frontier entry is
+#   0 / 1          a thicket; 1 if the cell to its left is river,
+#   NO_CELL        an inactive cell (or off the board),
+#   label<<2 | d   a river cell of path piece `label` with d river neighbors so far.
+# A state is the frontier plus two flags: whether the cell diagonally up-left
+# of the next cell is river (its thicket-count contribution to the cell leaving
+# the frontier) and whether the river has already been closed off.
+# A thicket's score is settled when it leaves the frontier, i.e. when the cell
+# to its right is decided; by then every one of its neighbors is known.
+NO_CELL = 2
+
+def _dp_gain(key, r, i):
     """
-    Display the final layout in a new Tkinter window:
-      - River cells: Soft blue (SkyBlue)
-      - Active thicket cells: Soft green (PaleGreen)
-      - Inactive cells: Light gray
-    We remove text labels to keep the display clean.
+    The most frontier thicket r can still gain from having its left bit set:
+    2 * 2^(neighbors that are, or might still become, river). Used to drop
+    states that another state with the same river pieces provably beats.
     """
-    window = tk.Tk()
-    window.title("Final Layout")
-    for i in range(HEIGHT):
-        for j in range(WIDTH):
-            cell = layout[i][j]
-            if cell == 'R':
-                bg = "SkyBlue"   # softer blue for river
-            elif cell == 'T':
-                bg = "PaleGreen" # softer green for thickets
-            else:  # Inactive
-                bg = "LightGray"
-            label = tk.Label(window, text="", width=2, height=1,
-                             bg=bg, relief="flat", borderwidth=1)
-            label.grid(row=i, column=j, padx=1, pady=1)
-    window.mainloop()
+    if i == HEIGHT - 1:
+        c = (r > 0 and key[r - 1] >= 4) + (r < HEIGHT - 1 and key[r + 1] >= 4)
+    elif r <= i:
+        c = (r > 0 and key[r - 1] >= 4) + (True if r == i else key[r + 1] >= 4)
+    else:
+        c = (key[HEIGHT] if r - 1 == i else key[r - 1] >= 4) + (r < HEIGHT - 1 and key[r + 1] >= 4)
+    return 2 << (c + 1)
+
+def _dp_prune(states, i, keep=None):
+    """
+    Drop dominated states: among states with the same river pieces and flags,
+    one whose score lead covers every thicket bit the other has and it lacks.
+    The state keep is never dropped.
+    """
+    groups = {}
+    for key, entry in states.items():
+        shape = tuple(v if v >= NO_CELL else 0 for v in key[:HEIGHT]) + key[HEIGHT:]
+        groups.setdefault(shape, []).append((entry[0], key))
+    kept = {}
+    for group in groups.values():
+        if len(group) > 1:
+            group.sort(reverse=True)
+        survivors = []
+        for score, key in group:
+            for best, other in survivors:
+                need = 0
+                for r in range(HEIGHT):
+                    if key[r] == 1 and other[r] == 0:
+                        need += _dp_gain(key, r, i)
+                if best - score >= need and key != keep:
+                    break
+            else:
+                survivors.append((score, key))
+                kept[key] = states[key]
+    return kept
+
+# Most parent links frontier_dp keeps for walking back to the river (8 bytes each).
+MAX_HISTORY = 4000000
+
+def frontier_dp(start, max_states=100000, incumbent=None, verbose=True, time_limit=None,
+                max_history=MAX_HISTORY, stop=None):
+    """
+    Exact optimum of the riverThicket objective for the current active_mask:
+    the best river that starts at start and never touches itself, found by a
+    broken-profile dynamic program over the frontier states described above.
+    max_states caps the states kept after each cell; past the cap only the
+    highest-scoring ones survive (a beam search) and the result is no longer
+    certified. max_history bounds the parent links kept over the whole run
+    the same way: a cell may keep as many states as the budget allows after
+    setting aside a small share for each cell still to come.
+    incumbent, a known river from start (e.g. the annealer's), is always
+    kept, so the result is never worse than it.
+    After time_limit seconds, or once stop (a threading.Event) is set, the
+    search gives up and returns the incumbent (or just the start), uncertified.
+    Returns (best_snake, best_score, exact).
+    """
+    si, sj = start
+    start_step = sj * HEIGHT + si
+    fallback = list(incumbent or [start])
+    incumbent = set(incumbent or ())
+    states = {(NO_CELL,) * HEIGHT + (0, 0): (0, -1)}
+    incumbent_key = next(iter(states)) if incumbent else None
+    history = []
+    # Every cell still to come is guaranteed a quarter of an even share of max_history.
+    stored = 0
+    reserve = max(1, max_history // (4 * WIDTH * HEIGHT))
+    exact = True
+    deadline = None if time_limit is None else time.time() + time_limit
+    for j in range(WIDTH):
+        for i in range(HEIGHT):
+            if (deadline is not None and time.time() > deadline
+                    or stop is not None and stop.is_set()):
+                if verbose:
+                    print(f"Gave up at column {j}; keeping the incumbent.")
+                return fallback, total_score(snake_to_layout(fallback)), False
+            step = j * HEIGHT + i
+            is_start = step == start_step
+            choices = (1,) if is_start else ((0, 1) if active_mask[i][j] else (0,))
+            last = i == HEIGHT - 1
+            incumbent_x = int((i, j) in incumbent)
+            next_incumbent_key = None
+            # The start is an end of the river, so it has at most one river neighbor.
+            up_cap = 1 if step - 1 == start_step else 2
+            left_cap = 1 if step - HEIGHT == start_step else 2
+            new_states = {}
+            for index, (key, (score, _)) in enumerate(states.items()):
+                diag, closed = key[HEIGHT], key[HEIGHT + 1]
+                up = key[i - 1] if i else NO_CELL
+                left = key[i]
+                down_left = NO_CELL if last else key[i + 1]
+                up_river = up >= 4
+                left_river = left >= 4
+                for x in choices:
+                    if x and closed:
+                        continue
+                    frontier = list(key[:HEIGHT])
+                    new_score = score
+                    new_closed = closed
+                    if left < NO_CELL:
+                        # The thicket to the left leaves the frontier: settle its score.
+                        new_score += 2 << (left + diag + (down_left >= 4) + x)
+                    if x:
+                        degree = up_river + left_river
+                        if degree > (1 if is_start else 2):
+                            continue
+                        if up_river and left_river and up >> 2 == left >> 2:
+                            continue  # would close a loop
+                        label = 63
+                        if up_river:
+                            if (up & 3) + 1 > up_cap:
+                                continue
+                            frontier[i - 1] = up + 1
+                            label = up >> 2
+                        if left_river:
+                            if (left & 3) + 1 > left_cap:
+                                continue
+                            if up_river:
+                                old = left >> 2
+                                frontier = [(label << 2) | (v & 3) if v >= 4 and v >> 2 == old else v
+                                            for v in frontier]
+                            else:
+                                label = left >> 2
+                        frontier[i] = (label << 2) | degree
+                    else:
+                        frontier[i] = (1 if left_river else 0) if active_mask[i][j] else NO_CELL
+                        if left_river and not any(v >= 4 and v >> 2 == left >> 2 for v in frontier):
+                            # The left cell's piece has no open end left: it must be the whole river.
+                            if start_step > step or any(v >= 4 for v in frontier):
+                                continue
+                            new_closed = 1
+                    # Renumber the pieces in order of appearance so equal frontiers share a key.
+                    labels = {}
+                    for r, v in enumerate(frontier):
+                        if v >= 4:
+                            piece = labels.setdefault(v >> 2, len(labels) + 1)
+                            frontier[r] = (piece << 2) | (v & 3)
+                    new_key = tuple(frontier) + (0 if last else int(left_river), new_closed)
+                    entry = new_states.get(new_key)
+                    if entry is None or entry[0] < new_score:
+                        new_states[new_key] = (new_score, index * 2 + x)
+                    if key == incumbent_key and x == incumbent_x:
+                        next_incumbent_key = new_key
+            incumbent_key = next_incumbent_key
+            states = _dp_prune(new_states, i, incumbent_key)
+            cap = min(max_states, max(reserve, max_history - stored
+                                      - (WIDTH * HEIGHT - step - 1) * reserve))
+            if len(states) > cap:
+                exact = False
+                ranked = sorted(states.items(), key=lambda item: item[1][0], reverse=True)
+                states = dict(ranked[:cap])
+                if incumbent_key is not None and incumbent_key not in states:
+                    states[incumbent_key] = new_states[incumbent_key]
+            history.append(array('q', (parent for _, parent in states.values())))
+            stored += len(states)
+        if verbose:
+            print(f"Column {j:2d} | States: {len(states):7d}")
+
+    # Settle the last column and keep the states whose river is one piece.
+    best_score, best_index = -1, None
+    for index, (key, (score, _)) in enumerate(states.items()):
+        pieces = {v >> 2 for v in key[:HEIGHT] if v >= 4}
+        if len(pieces) + key[HEIGHT + 1] != 1:
+            continue
+        for r in range(HEIGHT):
+            if key[r] < NO_CELL:
+                score += 2 << (key[r] + (r > 0 and key[r - 1] >= 4)
+                               + (r < HEIGHT - 1 and key[r + 1] >= 4))
+        if score > best_score:
+            best_score, best_index = score, index
+    if best_index is None:
+        return [start], total_score(snake_to_layout([start])), exact
+
+    # Walk the parent links back to the river cells, then order them from the start.
+    river = set()
+    for step in range(len(history) - 1, -1, -1):
+        packed = history[step][best_index]
+        if packed & 1:
+            j, i = divmod(step, HEIGHT)
+            river.add((i, j))
+        best_index = packed >> 1
+    snake = [start]
+    river.discard(start)
+    while river:
+        head = next(cell for cell in neighbors(*snake[-1]) if cell in river)
+        river.discard(head)
+        snake.append(head)
+    return snake, best_score, exact
 
 ####################################
 # Main
 ####################################
 def main():
+    from gui import run_selection, run_live, show_error
+
     # Run the UI for cell selection.
-    run_selection()
+    run_selection(active_mask)
     # After the selection window closes, active_mask reflects your choices.
-    
-    # Choose a starting border cell that is active.
-    start = None
-    # Try top border:
-    for j in range(WIDTH):
-        if active_mask[0][j]:
-            start = (0, j)
-            break
-    if start is None:
-        # Try bottom border:
-        for j in range(WIDTH):
-            if active_mask[HEIGHT-1][j]:
-                start = (HEIGHT-1, j)
-                break
-    if start is None:
-        # Try left border:
-        for i in range(HEIGHT):
-            if active_mask[i][0]:
-                start = (i, 0)
-                break
-    if start is None:
-        # Try right border:
-        for i in range(HEIGHT):
-            if active_mask[i][WIDTH-1]:
-                start = (i, WIDTH-1)
-                break
-    if start is None:
-        messagebox.showerror("Error", "No active border cell available for starting the river!")
-        return
 
-    # Generate an initial snake starting at the chosen border cell.
-    initial_snake = [start]
-    initial_snake = random_regrow(initial_snake, 0)
-    initial_layout = snake_to_layout(initial_snake)
-    initial_score = total_score(initial_layout)
-    print("Initial snake length:", len(initial_snake), "Score:", initial_score)
+    # Make sure there is an active border cell to start the river from.
+    if choose_start() is None:
+        show_error("No active border cell available for starting the river!")
+        return
 
-    # Run simulated annealing (this might take a couple minutes).
-    best_snake, best_score = simulated_annealing(initial_snake, time_limit=120)
-    best_layout = snake_to_layout(best_snake)
-    print("Best snake length:", len(best_snake), "Best score:", best_score)
+    # Anneal on a worker thread (this might take a couple minutes) while the
+    # window shows the best river so far.
+    def run(stop, publish):
+        return solve(active_mask, time_limit=120, verbose=True, stop=stop, publish=publish)
 
-    attackSpeed = 0
+    def describe(result):
+        return [f"Attack speed = {result['stats']['attackSpeed']}"]
 
-    # For each thicket, calculate the attack speed it gives.
-    # 2 base, 2^# of adjacent river cells
-    for i in range(HEIGHT):
-        for j in range(WIDTH):
-            if best_layout[i][j] == 'T':
-                attackSpeed += 2 * (2 ** count_river_neighbors(i, j, best_layout))
+    result = run_live(run, describe, HEIGHT, WIDTH, show_text=False)
+    if result is None:
+        return
+    print("Best snake length:", len(result["snake"]), "Best score:", result["score"])
 
     # Display the stats this layout gives.
-    print(f"Attack speed = {}")
-
-    # Display the final layout.
-    display_layout(best_layout)
+    print(f"Attack speed = {result['stats']['attackSpeed']}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,173 @@
+"""
+Cooling schedules shared by the simulated_annealing functions.
+
+A schedule is asked for the temperature of every iteration and told after
+each one whether the best score improved:
+    T = schedule.temperature(iteration)     # None: stop the run
+    action = schedule.observe(iteration, improved)
+observe returns None to carry on, REHEAT (informational, the schedule has
+already raised its own temperature), RESTART (the annealer should jump back
+to one of its elite states) or STOP (further gains are unlikely).
+Given a time_limit, a schedule calibrates itself to the machine: after a
+short warm-up it measures iterations per second and stretches or shrinks
+the rest of the ramp so that the cooling ends as the time runs out.
+Schedules pickle (for checkpoints) with their clock readings stored as
+ages, so a resumed run carries on at the same point of the ramp.
+"""
+import random, time
+
+REHEAT, RESTART, STOP = "reheat", "restart", "stop"
+
+
+class LinearSchedule:
+    """
+    The annealers' original schedule: a linear ramp from T0 to T_end over
+    total_iterations, stopping once the temperature is at or below T_stop.
+    With time_limit (seconds) total_iterations only covers the warm-up (the
+    first warmup fraction of the time); from then on the ramp is rescaled
+    every recalibrate fraction of the time to the measured iteration rate.
+    """
+    def __init__(self, T0=100.0, T_end=0.1, total_iterations=500000, T_stop=0.1,
+                 time_limit=None, warmup=0.02, recalibrate=0.1):
+        self.T0 = T0
+        self.T_end = T_end
+        self.total_iterations = total_iterations
+        self.T_stop = T_stop
+        self.offset = 0
+        self.time_limit = time_limit
+        self.warmup = warmup
+        self.recalibrate = recalibrate
+        self.started = None
+        self.next_check = None
+        self.last_check = None
+
+    def calibrate(self, iteration):
+        """Rescale the remaining ramp to fit the remaining time, keeping the current temperature."""
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+            self.next_check = now + self.warmup * self.time_limit
+            self.last_check = (now, iteration)
+            return
+        if now < self.next_check:
+            return
+        remaining = self.time_limit - (now - self.started)
+        # The speed drifts as the chain cools, so use the rate since the last check
+        # and check more often as the deadline nears.
+        last_time, last_iteration = self.last_check
+        rate = (iteration - last_iteration) / (now - last_time)
+        self.last_check = (now, iteration)
+        self.next_check = now + min(self.recalibrate * self.time_limit, remaining / 2)
+        frac = (iteration - self.offset) / self.total_iterations
+        if remaining <= 0 or frac >= 1.0 or rate <= 0:
+            return
+        # Aim to finish slightly early so the last, coldest iterations are not cut off.
+        left = 0.97 * remaining * rate
+        self.total_iterations = max(1, int(left / (1.0 - frac)))
+        self.offset = iteration - int(frac * self.total_iterations)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.started is not None:
+            now = time.perf_counter()
+            state["started"] = now - self.started
+            state["next_check"] = self.next_check - now
+            state["last_check"] = (now - self.last_check[0], self.last_check[1])
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.started is not None:
+            now = time.perf_counter()
+            self.started = now - state["started"]
+            self.next_check = now + state["next_check"]
+            self.last_check = (now - state["last_check"][0], state["last_check"][1])
+
+    def temperature(self, iteration):
+        if self.time_limit is not None and (self.started is None or not iteration & 255):
+            self.calibrate(iteration)
+        frac = min(1.0, (iteration - self.offset) / self.total_iterations)
+        T = self.T0 * (1 - frac) + self.T_end * frac
+        return None if T <= self.T_stop else T
+
+    def observe(self, iteration, improved):
+        return None
+
+    def reheat(self, iteration, T):
+        """Move the ramp back so that the next iteration runs at temperature T."""
+        frac = (self.T0 - T) / (self.T0 - self.T_end)
+        self.offset = iteration - int(frac * self.total_iterations)
+
+
+class ReactiveSchedule(LinearSchedule):
+    """
+    Linear ramp that reacts to stagnation. Once the chain is cold (below
+    cold_fraction of T0), patience iterations without a new best raise the
+    temperature back to reheat_fraction of T0; after reheats_per_restart
+    fruitless reheats the run restarts from an elite state at that
+    temperature, and after max_restarts restarts in a row without a new best
+    it stops.
+    """
+    def __init__(self, T0=100.0, T_end=0.1, total_iterations=500000, T_stop=0.1,
+                 time_limit=None, patience=20000, cold_fraction=0.05, reheat_fraction=0.2,
+                 reheats_per_restart=2, max_restarts=3):
+        super().__init__(T0, T_end, total_iterations, T_stop, time_limit)
+        self.patience = patience
+        self.cold_fraction = cold_fraction
+        self.reheat_fraction = reheat_fraction
+        self.reheats_per_restart = reheats_per_restart
+        self.max_restarts = max_restarts
+        self.last_improvement = 0
+        self.reheats = 0
+        self.restarts = 0
+        self.T = T0
+
+    def temperature(self, iteration):
+        T = super().temperature(iteration)
+        if T is None and self.restarts < self.max_restarts:
+            # Reaching the floor counts as stagnation too, as long as restarts remain.
+            T = self.T_stop
+            self.last_improvement = min(self.last_improvement, iteration - self.patience)
+        self.T = T
+        return T
+
+    def observe(self, iteration, improved):
+        if improved:
+            self.last_improvement = iteration
+            self.reheats = 0
+            self.restarts = 0
+            return None
+        if self.T > self.cold_fraction * self.T0:
+            # Hot chains wander by design; the stagnation clock starts once cold.
+            self.last_improvement = iteration
+            return None
+        if iteration - self.last_improvement < self.patience:
+            return None
+        self.last_improvement = iteration
+        self.reheat(iteration + 1, self.reheat_fraction * self.T0)
+        if self.reheats < self.reheats_per_restart:
+            self.reheats += 1
+            return REHEAT
+        if self.restarts < self.max_restarts:
+            self.reheats = 0
+            self.restarts += 1
+            return RESTART
+        return STOP
+
+
+class ElitePool:
+    """The size best distinct-scoring states seen, for restarts."""
+    def __init__(self, size=5):
+        self.size = size
+        self.entries = []
+
+    def offer(self, score, state):
+        if any(score == s for s, _ in self.entries):
+            return
+        self.entries.append((score, state))
+        self.entries.sort(key=lambda entry: entry[0], reverse=True)
+        del self.entries[self.size:]
+
+    def choice(self):
+        """A random elite as (score, state)."""
+        return random.choice(self.entries)
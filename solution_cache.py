@@ -0,0 +1,172 @@
+"""
+Persistent cache of FullForceVersion solutions.
+
+Entries are keyed by the active mask plus MAX_OASIS, canonicalised under
+horizontal and vertical mirroring (a board and its mirror images share one
+entry), and stored in an SQLite file as compact bit-packed records:
+    score (double) | snake length (uint16) | snake cells | dessert bits | suburb bits
+with one byte per snake cell on boards of at most 256 cells.
+The cache holds at most max_entries boards; the least recently used are evicted.
+Each board size has its own table, so one file can serve several sizes.
+"""
+import sqlite3, struct, time
+
+from bitboard import BitGeometry, popcount, bit_indices
+
+_HEADER = struct.Struct("<dH")
+
+
+class SolutionCache:
+    def __init__(self, path, width, height, max_entries=1000):
+        self.geometry = BitGeometry(width, height)
+        self.max_entries = max_entries
+        self.nbytes = (self.geometry.size + 7) // 8
+        self.cell_format = "B" if self.geometry.size <= 256 else "H"
+        # The four mirror symmetries as cell permutations; each is its own inverse.
+        self.transforms = []
+        for flip_i in (False, True):
+            for flip_j in (False, True):
+                perm = []
+                for k in range(self.geometry.size):
+                    i, j = divmod(k, width)
+                    if flip_i:
+                        i = height - 1 - i
+                    if flip_j:
+                        j = width - 1 - j
+                    perm.append(i * width + j)
+                self.transforms.append(perm)
+        # The game's 21 x 12 board keeps the table name used before sizes varied.
+        self.table = "solutions" if (width, height) == (21, 12) else f"solutions_{width}x{height}"
+        self.db = sqlite3.connect(path)
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                        "mask BLOB, max_oasis INTEGER, record BLOB, score REAL, used REAL, "
+                        "PRIMARY KEY (mask, max_oasis))")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    # Symmetry helpers
+    def _map_bits(self, x, perm):
+        out = 0
+        for k in bit_indices(x):
+            out |= 1 << perm[k]
+        return out
+
+    def _map_state(self, bit_state, perm):
+        snake, snake_bits, dessert, suburb = bit_state
+        return (tuple(perm[k] for k in snake), self._map_bits(snake_bits, perm),
+                self._map_bits(dessert, perm), self._map_bits(suburb, perm))
+
+    def canonical(self, active):
+        """Return (canonical mask bits, permutation mapping this board onto it)."""
+        return min(((self._map_bits(active, perm), perm) for perm in self.transforms),
+                   key=lambda pair: pair[0])
+
+    # Record packing
+    def _pack(self, bit_state, score):
+        snake, _, dessert, suburb = bit_state
+        return (_HEADER.pack(score, len(snake))
+                + struct.pack(f"<{len(snake)}{self.cell_format}", *snake)
+                + dessert.to_bytes(self.nbytes, "little")
+                + suburb.to_bytes(self.nbytes, "little"))
+
+    def _unpack(self, record):
+        score, length = _HEADER.unpack_from(record)
+        offset = _HEADER.size
+        cell_size = struct.calcsize(self.cell_format)
+        snake = struct.unpack_from(f"<{length}{self.cell_format}", record, offset)
+        offset += length * cell_size
+        dessert = int.from_bytes(record[offset:offset + self.nbytes], "little")
+        suburb = int.from_bytes(record[offset + self.nbytes:offset + 2 * self.nbytes], "little")
+        snake_bits = 0
+        for k in snake:
+            snake_bits |= 1 << k
+        return (tuple(snake), snake_bits, dessert, suburb), score
+
+    def _key(self, bits):
+        return bits.to_bytes(self.nbytes, "little")
+
+    # Lookups
+    def get(self, active, max_oasis):
+        """Exact hit: (bit_state oriented like active, score), or None."""
+        canon, perm = self.canonical(active)
+        row = self.db.execute(f"SELECT record FROM {self.table} WHERE mask = ? AND max_oasis = ?",
+                              (self._key(canon), max_oasis)).fetchone()
+        if row is None:
+            return None
+        self._touch(canon, max_oasis)
+        bit_state, score = self._unpack(row[0])
+        return self._map_state(bit_state, perm), score
+
+    def nearest(self, active, max_oasis, max_distance=8):
+        """
+        Closest cached board with the same max_oasis whose mask differs in at
+        most max_distance cells, under any mirroring of active.
+        Returns (distance, bit_state oriented like active, score) or None.
+        The state comes from a different mask and must be repaired before use.
+        """
+        best = None
+        views = [(self._map_bits(active, perm), perm) for perm in self.transforms]
+        for mask, record in self.db.execute(
+                f"SELECT mask, record FROM {self.table} WHERE max_oasis = ?", (max_oasis,)):
+            stored = int.from_bytes(mask, "little")
+            for view, perm in views:
+                distance = popcount(stored ^ view)
+                if distance <= max_distance and (best is None or distance < best[0]):
+                    best = (distance, record, perm)
+        if best is None:
+            return None
+        distance, record, perm = best
+        bit_state, score = self._unpack(record)
+        return distance, self._map_state(bit_state, perm), score
+
+    def put(self, active, max_oasis, bit_state, score):
+        """Store a solution unless the cache already holds one at least as good."""
+        canon, perm = self.canonical(active)
+        key = self._key(canon)
+        row = self.db.execute(f"SELECT score FROM {self.table} WHERE mask = ? AND max_oasis = ?",
+                              (key, max_oasis)).fetchone()
+        if row is not None and row[0] >= score:
+            self._touch(canon, max_oasis)
+            return
+        record = self._pack(self._map_state(bit_state, perm), score)
+        self.db.execute(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?, ?)",
+                        (key, max_oasis, record, score, time.time()))
+        self.db.execute(f"DELETE FROM {self.table} WHERE rowid IN (SELECT rowid FROM {self.table} "
+                        "ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+        self.db.commit()
+
+    def _touch(self, canon, max_oasis):
+        self.db.execute(f"UPDATE {self.table} SET used = ? WHERE mask = ? AND max_oasis = ?",
+                        (time.time(), self._key(canon), max_oasis))
+        self.db.commit()
+
+
+def repair(geometry, active, bit_state):
+    """
+    Fit a cached bit state to a (slightly different) active mask:
+      - the snake is cut before its first inactive cell (None if the start itself is gone),
+      - dessert flags are dropped from inactive and snake cells,
+      - suburbs on inactive cells are dropped, then isolated suburbs are
+        dropped until every remaining suburb has a suburb neighbor.
+    """
+    snake, _, dessert, suburb = bit_state
+    kept = []
+    for k in snake:
+        if not active >> k & 1:
+            break
+        kept.append(k)
+    if not kept:
+        return None
+    snake_bits = 0
+    for k in kept:
+        snake_bits |= 1 << k
+    dessert &= active & ~snake_bits
+    suburb &= active
+    while popcount(suburb) > 1:
+        isolated = suburb & ~geometry.any_neighbor(suburb)
+        if not isolated:
+            break
+        suburb &= ~isolated
+    return tuple(kept), snake_bits, dessert, suburb
@@ -0,0 +1,116 @@
+"""
+Optional run instrumentation for the annealers.
+
+A Telemetry object passed to simulated_annealing counts, per move type,
+the proposals, no-ops (the move left the state unchanged), acceptances and
+improvements (accepted with a strictly better score), and accumulates the
+time spent generating moves, updating the layout and scoring. An optional
+profiler (by default none; SamplingProfiler is provided) runs alongside.
+Everything exports as JSON or CSV once the run stops.
+"""
+import collections, csv, json, sys, threading, time
+
+COUNTERS = ("proposals", "noops", "accepted", "improved")
+PHASES = ("move", "layout", "score")
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the thread that called start() every interval
+    seconds from a background thread and counts the innermost frames by
+    function (file:line name). Cheap enough to leave on for a whole run.
+    """
+    def __init__(self, interval=0.005, depth=1):
+        self.interval = interval
+        self.depth = depth
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            for _ in range(self.depth):
+                if frame is None:
+                    break
+                code = frame.f_code
+                self.samples[f"{code.co_filename}:{code.co_firstlineno} {code.co_name}"] += 1
+                frame = frame.f_back
+
+    def report(self, top=25):
+        return dict(self.samples.most_common(top))
+
+
+class Telemetry:
+    def __init__(self, profiler=None):
+        self.moves = collections.defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        self.time = dict.fromkeys(PHASES, 0.0)
+        self.profiler = profiler
+        self.started = None
+        self.wall = 0.0
+        self.iterations = 0
+        # Solver-specific run counters (e.g. transposition table hits).
+        self.extra = {}
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.start()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.stop()
+        self.wall += time.perf_counter() - self.started
+
+    def record(self, kind, changed, accepted, improved):
+        counts = self.moves[kind]
+        counts["proposals"] += 1
+        if not changed:
+            counts["noops"] += 1
+        if accepted:
+            counts["accepted"] += 1
+        if improved:
+            counts["improved"] += 1
+        self.iterations += 1
+
+    def as_dict(self):
+        data = {"iterations": self.iterations, "wall_seconds": self.wall,
+                "phase_seconds": dict(self.time), "moves": {k: dict(v) for k, v in self.moves.items()},
+                "extra": dict(self.extra)}
+        if self.profiler is not None:
+            data["profile"] = self.profiler.report()
+        return data
+
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=1)
+
+    def to_csv(self, path):
+        """One row per value: section, key, metric, value."""
+        data = self.as_dict()
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["section", "key", "metric", "value"])
+            writer.writerow(["run", "", "iterations", data["iterations"]])
+            writer.writerow(["run", "", "wall_seconds", data["wall_seconds"]])
+            for key, value in data["extra"].items():
+                writer.writerow(["run", "", key, value])
+            for phase, seconds in data["phase_seconds"].items():
+                writer.writerow(["phase", phase, "seconds", seconds])
+            for kind, counts in data["moves"].items():
+                for metric, value in counts.items():
+                    writer.writerow(["move", kind, metric, value])
+            for where, count in data.get("profile", {}).items():
+                writer.writerow(["profile", where, "samples", count])
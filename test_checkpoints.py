@@ -0,0 +1,63 @@
+"""
+Checkpoint checks: a run resumed from its checkpoint must end exactly where
+the uninterrupted run does, and a checkpoint file solve() can't use must
+not stop it from solving.
+"""
+import math, pickle, random
+
+import pytest
+
+import FullForceVersion as F
+
+
+class StopAfter:
+    """A stop event that becomes set after being checked checks times."""
+    def __init__(self, checks):
+        self.checks = checks
+
+    def is_set(self):
+        self.checks -= 1
+        return self.checks < 0
+
+
+@pytest.mark.parametrize("backend", ["incremental", "bitboard"])
+def test_checkpoint_resume_is_deterministic(backend, tmp_path, random_board):
+    board = random_board(21, 12, seed=2, blocked=0.0, max_oasis=20)
+    random.seed(3)
+    initial = (F.random_regrow([F.choose_start()], 0, board, True),
+               F.init_dessert_mask(), F.init_suburb_mask())
+    options = dict(backend=backend, board=board, lookahead=True, verbose=False,
+                   total_iterations=3000, snake_weights=F.SNAKE_WEIGHTS)
+    random.seed(5)
+    full = F.simulated_annealing(initial, math.inf, stop=StopAfter(4000), **options)
+    checkpoint = str(tmp_path / "run.pickle")
+    random.seed(5)
+    F.simulated_annealing(initial, math.inf, stop=StopAfter(1000), checkpoint=checkpoint,
+                          **options)
+    resumed = F.resume_checkpoint(checkpoint, stop=StopAfter(3000), verbose=False)
+    assert resumed == full
+
+
+@pytest.mark.parametrize("contents", [b"", b"not a pickle",
+                                      pickle.dumps({"version": 1, "mask": [], "max_oasis": 50})],
+                         ids=["empty", "garbage", "version-1"])
+def test_solve_overwrites_unusable_checkpoint(contents, tmp_path):
+    checkpoint = tmp_path / "run.pickle"
+    checkpoint.write_bytes(contents)
+    mask = [[True] * 8 for _ in range(5)]
+    result = F.solve(mask, time_limit=0.5, seed=1, checkpoint=str(checkpoint))
+    assert result["score"] > 0 and not result["resumed"]
+    assert F.checkpoint_board(str(checkpoint)) == (mask, F.MAX_OASIS)
+
+
+def test_tempering_resume_is_deterministic(tmp_path, random_board):
+    random_board(13, 9, seed=4, max_oasis=10)
+    seeds = F.constructive_seeds(2)
+    options = dict(sweep_iterations=200, verbose=False, mtm_tries=F.MTM_TRIES)
+    random.seed(7)
+    full = F.parallel_tempering(seeds, math.inf, 2, stop=StopAfter(6), **options)
+    checkpoint = str(tmp_path / "run.pickle")
+    random.seed(7)
+    F.parallel_tempering(seeds, math.inf, 2, stop=StopAfter(3), checkpoint=checkpoint, **options)
+    resumed = F.resume_checkpoint(checkpoint, stop=StopAfter(3), verbose=False)
+    assert resumed[:2] == full[:2]
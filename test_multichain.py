@@ -0,0 +1,22 @@
+"""
+Checks of the NumPy multichain engine (skipped without NumPy): its stacked
+scorer must agree with the reference total_score_layout.
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import FullForceVersion as F
+import multichain as M
+
+
+def test_multichain_scores_agree(random_board, random_snapshots):
+    board = random_board(21, 12, seed=1)
+    snapshots = [snapshot for snapshot, _ in random_snapshots(board)]
+    values, channels = M.compile_values()
+    planes = [np.stack([M.bits_to_plane(snapshot[n]) for snapshot in snapshots])
+              for n in (1, 2, 3)]
+    tiles = M.classify(M.bits_to_plane(board.active_bits), *planes)
+    scores = M.channel_scores(M.channel_totals(tiles, values, channels)).tolist()
+    assert scores == [F.total_score_layout(F.state_to_layout(F.bits_to_state(snapshot)))
+                      for snapshot in snapshots]
@@ -0,0 +1,82 @@
+"""
+Consistency checks for the solvers: every scorer must agree with the
+reference total_score_layout. Run with python -m pytest.
+"""
+import random
+
+import pytest
+
+import FullForceVersion as F
+import riverThicket as R
+
+
+@pytest.mark.parametrize("width, height", [(21, 12), (13, 9), (5, 2)])
+def test_scorers_agree(width, height, random_board, random_snapshots):
+    board = random_board(width, height, seed=width * height)
+    for snapshot, score in random_snapshots(board):
+        reference = F.total_score_layout(F.state_to_layout(F.bits_to_state(snapshot)))
+        assert score == reference
+        assert F.total_score_bits(snapshot, board.active_bits) == reference
+        assert F.State(F.bits_to_state(snapshot), board).score() == reference
+
+
+@pytest.mark.parametrize("width, height", [(2, 2), (2, 9), (9, 2), (21, 12)])
+def test_constructive_seeds(width, height, random_board):
+    board = random_board(width, height, seed=width * height, blocked=0.2)
+    seeds = F.constructive_seeds(F.MAX_SEEDS, board)
+    assert seeds
+    for seed in seeds:
+        snake = seed[0]
+        assert snake[0] in F.start_cells() and all(board.active[i * width + j] for i, j in snake)
+        assert F.State(seed, board).score() == F.total_score_layout(F.state_to_layout(seed))
+
+
+def test_batch_reports_bad_lines(tmp_path):
+    import batch
+    boards = tmp_path / "boards.jsonl"
+    boards.write_text('{"mask": ["..", ".."]}\n{oops\n\n[1]\n{"id": "x", "mask": ["..."]}\n')
+    tasks = list(batch.read_tasks([str(boards)], {"solver": "full"}))
+    assert [task["id"] for task in tasks] == [0, 1, 2, "x"]
+    assert ["error" in task for task in tasks] == [False, True, True, False]
+    assert "line 2" in tasks[1]["error"]
+
+
+def best_river_by_brute_force(start):
+    """The best riverThicket score over every river from start, by enumeration."""
+    best = 0
+
+    def extend(snake):
+        nonlocal best
+        best = max(best, R.total_score(R.snake_to_layout(snake)))
+        for cell in R.neighbors(*snake[-1]):
+            if (R.active_mask[cell[0]][cell[1]] and cell not in snake
+                    and sum(n in snake for n in R.neighbors(*cell)) == 1):
+                snake.append(cell)
+                extend(snake)
+                snake.pop()
+
+    extend([start])
+    return best
+
+
+@pytest.mark.parametrize("width, height, seed", [(4, 3, 0), (4, 4, 1), (5, 4, 2), (5, 4, 3),
+                                                  (3, 5, 4), (6, 3, 5)])
+def test_frontier_dp_matches_brute_force(width, height, seed):
+    rng = random.Random(seed)
+    R.set_board_size(width, height)
+    R.active_mask = [[rng.random() > 0.2 for _ in range(width)] for _ in range(height)]
+    R.active_mask[0][0] = True
+    start = R.choose_start()
+    snake, score, certified = R.frontier_dp(start, verbose=False)
+    assert certified
+    assert score == R.total_score(R.snake_to_layout(snake)) == best_river_by_brute_force(start)
+    assert snake[0] == start
+
+
+def test_frontier_dp_gives_up_on_time():
+    R.set_board_size(21, 12)
+    incumbent = R.random_regrow([(0, 0)], 0)
+    snake, score, certified = R.frontier_dp((0, 0), incumbent=incumbent, verbose=False,
+                                            time_limit=0.5)
+    assert not certified
+    assert score >= R.total_score(R.snake_to_layout(incumbent))